@@ -1,78 +1,61 @@
 import tkinter as tk
 import threading
-import subprocess
 import time
 import webbrowser
-import socket
+import logging
 import sys
 import os
 
+from notebook_servers import (
+    MAIN_UI_NOTEBOOK,
+    MAIN_UI_PORT,
+    ServerManager,
+    app_url,
+    is_port_open,
+)
 
-NOTEBOOKS = [
-    ("001_All_Types.ipynb",          8866),
-    ("002_Data_export.ipynb",        8867),
-    ("003_VMNED_Data_Export.ipynb",  8869),
-    ("004_Factorupdate.ipynb",       8870),
-    ("005_MV_Switch.ipynb",          8871),
-    ("006_Vervanging_Tool.ipynb",    8872),
-    ("007_Storage_Method.ipynb",    8873),
-    ("000_Start_UI.ipynb",           8868) # main UI
-]
-
-MAIN_UI_PORT     = 8868
-MAIN_UI_NOTEBOOK = "000_Start_UI.ipynb"
-
-def is_port_open(host, port, timeout=1):
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-        sock.settimeout(timeout)
-        return sock.connect_ex((host, port)) == 0
-
-def launch_notebook(notebook, port):
-    cmd = [
-        "voila",
-        notebook,
-        f"--port={port}",
-        "--no-browser",
-        "--ip=127.0.0.1"
-    ]
-    print(f"[INFO] Launching {notebook} on port {port} with: {' '.join(cmd)}")
-    return subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        cwd=os.getcwd()
-    )
-
-def start_servers_and_wait(update_label):
-    for nb, port in NOTEBOOKS:
-        if not os.path.isfile(nb):
-            msg = f"[ERROR] Notebook '{nb}' not found in {os.getcwd()}."
-            print(msg)
-            update_label(msg)
-            return
-
-    processes = []
-    for nb, port in NOTEBOOKS:
-        update_label(f"Launching {nb} on port {port}...")
-        proc = launch_notebook(nb, port)
-        processes.append(proc)
-        time.sleep(0.5)
-
-    update_label(f"Waiting for {MAIN_UI_NOTEBOOK} on port {MAIN_UI_PORT}...")
-    while not is_port_open("127.0.0.1", MAIN_UI_PORT):
-        time.sleep(2)
+# Only the main UI starts here; the other notebooks are started on demand by
+# the buttons in 000_Start_UI (via the control endpoint of ServerManager) and
+# stopped again after LAUNCHER_IDLE_MINUTES without use.
+LOG_DIR = os.getenv("LAUNCHER_LOG_DIR", os.path.join(os.getcwd(), "..", "logs"))
+
+
+def start_servers_and_wait(manager, update_label):
+    missing = manager.missing_notebooks()
+    if missing:
+        msg = f"[ERROR] Notebook '{missing[0]}' not found in {os.getcwd()}."
+        print(msg)
+        update_label(msg)
+        return
+
+    manager.serve()
+    update_label(f"Launching {MAIN_UI_NOTEBOOK} on port {MAIN_UI_PORT}...")
+    try:
+        url = manager.ensure_running(MAIN_UI_NOTEBOOK)
+    except RuntimeError as exc:
+        update_label(f"[ERROR] {exc}")
+        return
 
     update_label("Application is ready! Opening your browser...")
-    webbrowser.open(f"http://127.0.0.1:{MAIN_UI_PORT}")
+    webbrowser.open(url)
 
-    update_label("All notebooks are running. Close this window to exit.")
     while True:
-        if not any(p.poll() is None for p in processes):
-            update_label("One or more notebooks have exited; shutting down...")
+        if not is_port_open("127.0.0.1", MAIN_UI_PORT):
+            update_label(f"{MAIN_UI_NOTEBOOK} has exited; shutting down...")
+            manager.stop_all()
             break
+        apps = [nb.split("_", 1)[0] for nb in manager.running() if nb != MAIN_UI_NOTEBOOK]
+        update_label(
+            f"Main UI running at {app_url(MAIN_UI_PORT)}\n"
+            f"Open apps: {', '.join(apps) or 'none'}. Close this window to exit."
+        )
         time.sleep(2)
 
+
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    manager = ServerManager(os.getcwd(), log_dir=LOG_DIR)
+
     root = tk.Tk()
     root.title("EnergyMonitor Launcher")
     root.geometry("480x200")
@@ -85,11 +68,12 @@ def main():
         status_label.config(text=msg)
         print(msg)
 
-    thread = threading.Thread(target=start_servers_and_wait, args=(update_label,))
+    thread = threading.Thread(target=start_servers_and_wait, args=(manager, update_label), daemon=True)
     thread.start()
 
     def on_closing():
         update_label("Shutting down application processes...")
+        manager.stop_all()
         root.destroy()
         sys.exit(0)
 
@@ -1,39 +1,429 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sys
 import threading
 import time
-from typing import Any, Optional, Hashable, Tuple
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Optional, Hashable, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (Parquet-engine voor DiskCache)
+    _PARQUET_AVAILABLE = True
+except ImportError:
+    _PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SWEEP_INTERVAL = 60  # sec tussen twee opruimrondes van de achtergrond-sweeper
+
+_sweep_registry: "weakref.WeakSet[TTLCache]" = weakref.WeakSet()
+_sweeper_thread: Optional[threading.Thread] = None
+_sweeper_lock = threading.Lock()
+
+
+def _sweep_loop() -> None:
+    while True:
+        time.sleep(SWEEP_INTERVAL)
+        for cache in list(_sweep_registry):
+            cache.sweep()
+
+
+def _start_sweeper() -> None:
+    global _sweeper_thread
+    with _sweeper_lock:
+        if _sweeper_thread is None or not _sweeper_thread.is_alive():
+            _sweeper_thread = threading.Thread(target=_sweep_loop, name="cache-sweeper", daemon=True)
+            _sweeper_thread.start()
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Schat het geheugengebruik van een cache-waarde in bytes.
+    DataFrames/Series tellen hun volledige (deep) geheugengebruik; tuples, lijsten,
+    sets en dicts worden recursief opgeteld.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, (tuple, list, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+_MISSING = object()
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Bundelt gelijktijdige aanroepen met dezelfde key tot één uitvoering.
+
+    De eerste aanroeper voert de functie uit; aanroepers die binnenkomen terwijl
+    die nog loopt wachten en krijgen hetzelfde resultaat óf dezelfde exception.
+    Zo leidt een dubbelklik niet tot twee identieke stored-procedure-calls.
+    Wordt de eerste aanroeper afgebroken (een BaseException zoals
+    `job_runner.JobCancelled`), dan voert een wachtende de functie zelf opnieuw uit.
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is None:
+                return call.value
+            if isinstance(call.error, Exception):
+                raise call.error
+            return self.do(key, fn)
+
+        try:
+            call.value = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
 
 class TTLCache:
     """
-    Een eenvoudige, thread-safe time-to-live cache.
-    
+    Thread-safe cache met time-to-live, LRU-verwijdering en een geheugenbudget.
+
+    Elke entry verloopt `ttl` seconden na het zetten (monotone klok). Wordt
+    `max_bytes` of `max_entries` overschreden, dan verdwijnen de minst recent
+    gebruikte entries. Een achtergrond-sweeper ruimt verlopen entries ook op als
+    ze niet meer gelezen worden, zodat langlopende kernels niet blijven groeien.
+
     Attributes:
         ttl (int): Levensduur van een cache-entry in seconden.
+        max_bytes (int | None): Geheugenbudget in bytes (None = onbegrensd).
+        max_entries (int | None): Maximaal aantal entries (None = onbegrensd).
     """
-    def __init__(self, ttl: int = 300) -> None:
-        self._cache: dict[Hashable, Tuple[Any, float]] = {}
+    def __init__(
+        self,
+        ttl: int = 300,
+        *,
+        max_bytes: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        sweep: bool = True,
+    ) -> None:
+        # key -> (value, expires_at, size_in_bytes); volgorde = LRU → MRU
+        self._cache: OrderedDict[Hashable, Tuple[Any, float, int]] = OrderedDict()
         self.ttl: int = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
         self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._flights = SingleFlight()
+        if sweep:
+            _sweep_registry.add(self)
+            _start_sweeper()
+
+    def _drop(self, key: Hashable) -> None:
+        _, _, size = self._cache.pop(key)
+        self._bytes -= size
+
+    def _lookup(self, key: Hashable, *, count: bool = True) -> Any:
+        """Waarde voor 'key' of `_MISSING`; ook een gecachte None telt als hit."""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self._misses += count
+                return _MISSING
+            value, expires_at, _ = entry
+            if time.monotonic() > expires_at:
+                # Verwijder verlopen entry
+                self._drop(key)
+                self._expirations += 1
+                self._misses += count
+                return _MISSING
+            self._cache.move_to_end(key)
+            self._hits += count
+            return value
 
     def get(self, key: Hashable) -> Optional[Any]:
         """
         Haal de waarde voor 'key' op als deze nog niet verlopen is.
         Returns None als de key niet bestaat of verlopen is.
         """
-        with self._lock:
-            entry = self._cache.get(key)
-            if entry is None:
-                return None
-            value, expires_at = entry
-            if time.time() > expires_at:
-                # Verwijder verlopen entry
-                del self._cache[key]
-                return None
+        value = self._lookup(key)
+        return None if value is _MISSING else value
+
+    def get_or_compute(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Geef de gecachte waarde voor 'key', of bereken hem met `loader()` en cache
+        het resultaat (ook None). Gelijktijdige aanroepen met dezelfde key wachten
+        op één lopende `loader` en delen diens resultaat of exception; een
+        exception wordt niet gecachet.
+        """
+        value = self._lookup(key)
+        if value is not _MISSING:
             return value
 
+        def _load() -> Any:
+            # Een andere thread kan net klaar zijn tussen lookup en flight-start
+            value = self._lookup(key, count=False)
+            if value is _MISSING:
+                value = loader()
+                self.set(key, value)
+            return value
+
+        return self._flights.do(key, _load)
+
     def set(self, key: Hashable, value: Any) -> None:
         """
-        Voeg of update een entry met huidige tijd + TTL als vervaldatum.
+        Voeg of update een entry met huidige tijd + TTL als vervaldatum en
+        verwijder zo nodig LRU-entries tot het budget weer klopt. Een waarde die
+        in zijn eentje groter is dan `max_bytes` wordt niet opgeslagen.
+        """
+        size = estimate_size(value) if self.max_bytes is not None else 0
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if key in self._cache:
+                self._drop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                logger.debug("Cache-entry van %d bytes past niet in budget %d; overgeslagen.", size, self.max_bytes)
+                return
+            self._cache[key] = (value, expires_at, size)
+            self._bytes += size
+            while self._cache and (
+                (self.max_bytes is not None and self._bytes > self.max_bytes)
+                or (self.max_entries is not None and len(self._cache) > self.max_entries)
+            ):
+                self._drop(next(iter(self._cache)))
+                self._evictions += 1
+
+    def sweep(self) -> int:
+        """Verwijder alle verlopen entries; retourneert het aantal verwijderde entries."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [k for k, (_, expires_at, _) in self._cache.items() if now > expires_at]
+            for key in expired:
+                self._drop(key)
+            self._expirations += len(expired)
+        return len(expired)
+
+    def clear(self) -> None:
+        """Leeg de cache (tellers blijven behouden)."""
+        with self._lock:
+            self._cache.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss/eviction-tellers plus huidige omvang, voor het dimensioneren van budgetten."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._cache),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "coalesced": self._flights.coalesced,
+            }
+
+
+class DiskCache:
+    """
+    Persistente cache-laag op schijf voor DataFrames (Parquet).
+
+    Elke entry is één Parquet-bestand waarvan de naam een hash van de cache-key is.
+    De bestanden zelf zijn de administratie: de mtime is het aanmaakmoment, de
+    atime het laatste gebruik (`get` zet die met `os.utime`). Entries ouder dan
+    `ttl` seconden gelden als verlopen. Overschrijdt de totale omvang
+    `max_bytes`, dan verwijdert `set` de minst recent gebruikte bestanden (LRU).
+
+    `manifest.json` is alleen een index om de cache te inspecteren (met de
+    leesbare key per bestand); `set` bouwt hem opnieuw op uit de bestanden.
+    Omdat de bestanden de administratie zijn en niet het manifest, kunnen
+    meerdere Voila-processen de cache delen zonder elkaars entries te
+    overschrijven (schrijven gaat atomisch via een tijdelijk bestand).
+
+    Zonder `pyarrow` is de cache uitgeschakeld: `get` geeft dan altijd None en
+    `set` doet niets.
+
+    Attributes:
+        directory (Path): Map waarin bestanden en manifest staan.
+        max_bytes (int): Maximale totale omvang op schijf in bytes.
+        ttl (int): Levensduur van een entry in seconden.
+    """
+    MANIFEST_NAME = "manifest.json"
+
+    def __init__(self, directory: str | os.PathLike, max_bytes: int, ttl: int = 86400) -> None:
+        self.directory = Path(directory).expanduser()
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.enabled = _PARQUET_AVAILABLE and max_bytes > 0
+        if not self.enabled:
+            if not _PARQUET_AVAILABLE:
+                logger.warning("pyarrow niet beschikbaar; schijfcache %s uitgeschakeld.", self.directory)
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        except OSError as exc:
+            logger.warning("Schijfcache %s niet bruikbaar (%s); uitgeschakeld.", self.directory, exc)
+            self.enabled = False
+
+    # ------------------------------------------------------------------ intern
+    @staticmethod
+    def _digest(key: Hashable) -> str:
+        return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / f"{digest}.parquet"
+
+    def _scan(self) -> dict[str, dict[str, Any]]:
+        """Index van alle bestanden op schijf (ook die van andere processen)."""
+        try:
+            with open(self.directory / self.MANIFEST_NAME, "r", encoding="utf-8") as f:
+                keys = {d: e["key"] for d, e in json.load(f).items() if "key" in e}
+        except (OSError, ValueError, AttributeError, TypeError):
+            keys = {}
+        index = {}
+        for path in self.directory.glob("*.parquet"):
+            try:
+                stat = path.stat()
+            except OSError:  # net verwijderd door een ander proces
+                continue
+            index[path.stem] = {
+                "size": stat.st_size,
+                "created": stat.st_mtime,
+                "last_access": max(stat.st_atime, stat.st_mtime),
+            }
+            if path.stem in keys:
+                index[path.stem]["key"] = keys[path.stem]
+        return index
+
+    def _save_manifest(self, index: dict[str, dict[str, Any]]) -> None:
+        tmp = self.directory / f".{self.MANIFEST_NAME}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp, self.directory / self.MANIFEST_NAME)
+
+    def _remove(self, digest: str) -> None:
+        try:
+            self._path(digest).unlink()
+        except OSError:
+            pass
+
+    # ---------------------------------------------------------------- publiek
+    def get(self, key: Hashable) -> Optional[pd.DataFrame]:
+        """
+        Lees de DataFrame voor 'key' van schijf als die bestaat en niet verlopen is.
+        Returns None bij een miss, een verlopen entry of een onleesbaar bestand.
+        """
+        if not self.enabled:
+            return None
+        digest = self._digest(key)
+        path = self._path(digest)
+        try:
+            created = path.stat().st_mtime
+        except OSError:
+            return None
+        now = time.time()
+        if now - created > self.ttl:
+            self._remove(digest)
+            return None
+        try:
+            df = pd.read_parquet(path)
+        except Exception as exc:  # pragma: no cover
+            logger.warning("Schijfcache-bestand %s onleesbaar: %s", digest, exc)
+            self._remove(digest)
+            return None
+        try:
+            os.utime(path, (now, created))  # laatste gebruik; mtime blijft het aanmaakmoment
+        except OSError:
+            pass
+        return df
+
+    def set(self, key: Hashable, value: Optional[pd.DataFrame]) -> None:
+        """
+        Schrijf een DataFrame naar schijf en verwijder zo nodig verlopen en minst
+        recent gebruikte entries tot de totale omvang weer onder `max_bytes` ligt.
+        Lege resultaten (None of een lege DataFrame) worden niet opgeslagen.
         """
-        expires_at = time.time() + self.ttl
+        if not self.enabled or value is None or value.empty:
+            return
+        digest = self._digest(key)
+        path = self._path(digest)
+        tmp = path.with_name(f".{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            value.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+        except Exception as exc:  # pragma: no cover
+            logger.warning("Schrijven naar schijfcache mislukt: %s", exc)
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            index = self._scan()
+            now = time.time()
+            for old in [d for d, e in index.items() if now - e["created"] > self.ttl and d != digest]:
+                del index[old]
+                self._remove(old)
+            total = sum(e["size"] for e in index.values())
+            for old in sorted(index, key=lambda d: index[d]["last_access"]):
+                if total <= self.max_bytes:
+                    break
+                if old == digest:
+                    continue
+                total -= index.pop(old)["size"]
+                self._remove(old)
+            if digest in index:
+                index[digest]["key"] = repr(key)
+            self._save_manifest(index)
+
+    def clear(self) -> None:
+        """Verwijder alle entries en het manifest."""
+        if not self.enabled:
+            return
         with self._lock:
-            self._cache[key] = (value, expires_at)
+            for digest in self._scan():
+                self._remove(digest)
+            try:
+                (self.directory / self.MANIFEST_NAME).unlink()
+            except OSError:
+                pass
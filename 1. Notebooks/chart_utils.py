@@ -0,0 +1,117 @@
+"""
+chart_utils.py
+--------------
+Server-side level-of-detail helpers for Plotly time-series charts.
+
+A browser chokes on traces with 100k+ points, so traces are decimated to a
+bounded number of points before they are handed to Plotly:
+
+• min/max bucketing   – keeps the lowest and highest point of every bucket,
+                        so no peak or dip disappears (default)
+• LTTB                – Largest-Triangle-Three-Buckets, keeps the visual shape
+                        with one point per bucket
+
+Both return *row positions*, so the same selection can be applied to the x
+values, y values, hover text and marker arrays of a trace.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+# Points per trace handed to the browser; about two per horizontal pixel.
+DEFAULT_MAX_POINTS = 4000
+
+
+def _as_float(values) -> np.ndarray:
+    arr = np.asarray(values)
+    if np.issubdtype(arr.dtype, np.datetime64):
+        return arr.astype("datetime64[ns]").astype("int64").astype("float64")
+    return arr.astype("float64")
+
+
+def minmax_indices(y, n_out: int) -> np.ndarray:
+    """First, last and the min + max of `(n_out - 2) // 2` equal buckets."""
+    yy = _as_float(y)
+    n = len(yy)
+    if n <= n_out:
+        return np.arange(n)
+
+    n_buckets = max(1, (n_out - 2) // 2)
+    edges = np.linspace(1, n - 1, n_buckets + 1).astype("int64")
+    starts, ends = edges[:-1], edges[1:]
+
+    # Buckets differ at most one in length: gather them in one padded 2-D grid
+    width = int((ends - starts).max())
+    grid = starts[:, None] + np.arange(width)
+    valid = grid < ends[:, None]
+    grid = np.where(valid, grid, starts[:, None])
+    vals = yy[grid]
+    usable = valid & ~np.isnan(vals)
+
+    rows = np.arange(n_buckets)
+    lows = grid[rows, np.where(usable, vals, np.inf).argmin(axis=1)]
+    highs = grid[rows, np.where(usable, vals, -np.inf).argmax(axis=1)]
+    return np.unique(np.concatenate(([0], lows, highs, [n - 1])))
+
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: one point per bucket, shape-preserving."""
+    yy = np.nan_to_num(_as_float(y))
+    n = len(yy)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    xx = _as_float(x)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype("int64")  # n_out - 2 buckets
+    out = np.empty(n_out, dtype="int64")
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = xx[hi:nxt_hi].mean(), yy[hi:nxt_hi].mean()
+        area = np.abs(
+            (xx[a] - avg_x) * (yy[lo:hi] - yy[a]) - (xx[a] - xx[lo:hi]) * (avg_y - yy[a])
+        )
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def decimate_indices(
+    x,
+    y,
+    max_points: int = DEFAULT_MAX_POINTS,
+    *,
+    method: str = "minmax",
+    keep: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Sorted row positions to plot for one trace.
+
+    `keep` is a boolean mask of rows that must survive regardless (e.g. points
+    with a T/P status marker); they come on top of the `max_points` budget.
+    """
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    if method == "minmax":
+        idx = minmax_indices(y, max_points)
+    elif method == "lttb":
+        idx = lttb_indices(x, y, max_points)
+    else:
+        raise ValueError(f"Unknown decimation method '{method}'")
+    if keep is not None and keep.any():
+        idx = np.union1d(idx, np.flatnonzero(keep))
+    return idx
+
+
+__all__ = [
+    "DEFAULT_MAX_POINTS",
+    "minmax_indices",
+    "lttb_indices",
+    "decimate_indices",
+]
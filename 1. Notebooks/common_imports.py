@@ -1,53 +1,252 @@
 # common_imports.py
+"""
+Gedeelde imports voor alle notebooks (`from common_imports import *`).
+
+Zware afhankelijkheden (pandas, numpy, plotly, ipywidgets, ipyaggrid,
+xlsxwriter, pytz, dateutil) worden lui geladen: de namen bestaan direct, de
+echte import volgt pas bij het eerste attribuut-gebruik (`pd.DataFrame`,
+`go.FigureWidget`, `Grid(...)`). Zo betaalt elke Voila-kernel alleen voor wat
+het notebook echt gebruikt.
+
+Opstarttijd: `startup_report()` geeft per stap (eager imports, CSS, elke luie
+import, elke uitgevoerde cel) de duur en het tijdstip sinds de start van
+deze module. Met `STARTUP_REPORT=1` wordt na elke cel een regel gelogd, zodat
+time-to-first-render per notebook in de Voila-log staat.
+
+Voorverwarmde kernels (Voila `--preheat_kernel`, zie notebook_servers): het
+notebook draait al vóór de aanvraag; `wait_for_request()` markeert het punt
+waarna code pas bij het openen van de pagina loopt (bijv. standaarddatums).
+"""
+import time as _time
+
+_T0 = _time.perf_counter()
+
 import os
+import sys
+import importlib
+import threading
+import logging
+import types
 from IPython.display import display, HTML, clear_output
 
-# ── Injecteer optioneel custom notebook CSS ──
-_css_path = os.path.join(os.getcwd(), 'custom.css')
-if os.path.isfile(_css_path):
-    with open(_css_path, 'r') as _f:
-        _css = _f.read()
-    display(HTML(f'<style>{_css}</style>'))
-else:
-    display(HTML(
-        f'<p style="color:red;"><strong>custom.css niet gevonden:</strong> {_css_path}</p>'
-    ))
+_logger = logging.getLogger(__name__)
+
+# ── Opstart-metingen ──
+STARTUP_REPORT = os.getenv("STARTUP_REPORT", "0") == "1"
+_startup: list = []          # dicts: stap, soort, duur_s, sinds_start_s
+_startup_lock = threading.Lock()
+
+
+def _record(step: str, kind: str, duration: float) -> None:
+    with _startup_lock:
+        _startup.append({
+            "stap": step,
+            "soort": kind,
+            "duur_s": round(duration, 4),
+            "sinds_start_s": round(_time.perf_counter() - _T0, 4),
+        })
+
+
+def mark(step: str) -> None:
+    """Eigen mijlpaal in het opstartrapport (bijv. 'UI getoond')."""
+    _record(step, "mijlpaal", 0.0)
+
+
+def startup_report() -> list:
+    """Alle opstartstappen tot nu toe, in volgorde van afronding."""
+    with _startup_lock:
+        return list(_startup)
+
+
+# ── Luie imports ──
+class _LazyModule(types.ModuleType):
+    """
+    Plaatshouder voor een module: bij het eerste ontbrekende attribuut wordt
+    de echte module geïmporteerd en haar namespace overgenomen, zodat latere
+    lookups gewone dict-hits zijn (geen proxy-overhead).
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_lock"] = threading.Lock()
+        self.__dict__["_lazy_loaded"] = False
+
+    def _load(self):
+        with self._lazy_lock:
+            if not self._lazy_loaded:
+                t0 = _time.perf_counter()
+                try:
+                    module = importlib.import_module(self.__name__)
+                except ImportError as exc:
+                    raise ImportError(f"Module '{self.__name__}' ontbreekt: {exc}") from exc
+                self.__dict__.update(module.__dict__)
+                self.__dict__["_lazy_loaded"] = True
+                _record(f"import {self.__name__}", "lui", _time.perf_counter() - t0)
+        return sys.modules[self.__name__]
+
+    def __getattr__(self, attr):
+        if attr.startswith("__") and attr.endswith("__") and attr not in ("__version__", "__path__", "__file__"):
+            raise AttributeError(attr)
+        module = self._load()
+        if attr in self.__dict__:
+            return self.__dict__[attr]
+        return getattr(module, attr)  # modules met eigen __getattr__ (plotly.graph_objects)
+
+    def __setattr__(self, attr, value):
+        # Schrijven gaat naar de echte module, zodat andere importeurs het ook zien
+        setattr(self._load(), attr, value)
+        self.__dict__[attr] = value
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "" if self._lazy_loaded else " (lui, nog niet geladen)"
+        return f"<module '{self.__name__}'{state}>"
+
+
+class _LazyAttr:
+    """Luie `from module import naam` voor functies en klassen die worden aangeroepen."""
+
+    __slots__ = ("_module", "_attr", "_target")
+
+    def __init__(self, module: str, attr: str):
+        self._module = module
+        self._attr = attr
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            self._target = getattr(_lazy(self._module), self._attr)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
 
-# Standaard imports voor notebooks en utils
+    def __repr__(self):
+        return f"<lui {self._module}.{self._attr}>"
+
+
+_lazy_modules: dict = {}
+
+
+def _lazy(name: str):
+    """Geladen module als die er al is (geen plaatshouder nodig), anders een `_LazyModule`."""
+    if name in sys.modules:
+        return sys.modules[name]
+    return _lazy_modules.setdefault(name, _LazyModule(name))
+
+
+# Standaard imports voor notebooks en utils (stdlib: goedkoop, direct geladen)
 import io
 import re
 import time
-import threading
-import logging
 import traceback
 from datetime import datetime, date, timedelta
 from pathlib import Path
-from dateutil.relativedelta import relativedelta
 from collections import deque
 from typing import Tuple, Optional, Set, List, Dict, Callable
+import urllib
+from urllib import parse
 
-import pandas as pd
-import numpy as np
-import pytz
-
+# SQLAlchemy is bij de eerste cel toch nodig (get_engine); SQLAlchemyError
+# moet bovendien een echte klasse zijn voor `except`.
 import sqlalchemy
 from sqlalchemy import text
 from sqlalchemy.pool import NullPool
-import pyodbc
 from sqlalchemy.exc import SQLAlchemyError
-from pandas import read_sql_query
-import urllib
-from urllib import parse
-
-import plotly.graph_objects as go
-import plotly.io as pio
-import ipywidgets as widgets
-from ipywidgets import GridBox, Layout
-from xlsxwriter.utility import xl_col_to_name
-from ipyaggrid import Grid
 
 # Database helper
 from db_connection import get_engine
+from notebook_servers import start_heartbeat
+
+# Zware afhankelijkheden: lui
+pd = _lazy("pandas")
+np = _lazy("numpy")
+pytz = _lazy("pytz")
+pyodbc = _lazy("pyodbc")
+go = _lazy("plotly.graph_objects")
+pio = _lazy("plotly.io")
+widgets = _lazy("ipywidgets")
+relativedelta = _LazyAttr("dateutil.relativedelta", "relativedelta")
+read_sql_query = _LazyAttr("pandas", "read_sql_query")
+GridBox = _LazyAttr("ipywidgets", "GridBox")
+Layout = _LazyAttr("ipywidgets", "Layout")
+xl_col_to_name = _LazyAttr("xlsxwriter.utility", "xl_col_to_name")
+Grid = _LazyAttr("ipyaggrid", "Grid")
+
+_record("eager imports", "eager", _time.perf_counter() - _T0)
+
+# ── Injecteer optioneel custom notebook CSS ──
+_t_css = _time.perf_counter()
+_css_path = os.path.join(os.getcwd(), 'custom.css')
+if os.path.isfile(_css_path):
+    with open(_css_path, 'r') as _f:
+        _css = _f.read()
+    display(HTML(f'<style>{_css}</style>'))
+else:
+    display(HTML(
+        f'<p style="color:red;"><strong>custom.css niet gevonden:</strong> {_css_path}</p>'
+    ))
+_record("custom.css", "eager", _time.perf_counter() - _t_css)
+
+
+# ── Cel-tijden via IPython-events (Voila voert de cellen na elkaar uit) ──
+def _install_cell_timer() -> None:
+    try:
+        from IPython import get_ipython
+    except ImportError:
+        return
+    ip = get_ipython()
+    if ip is None:
+        return
+    state = {"cell": 0, "t": _time.perf_counter()}
+    notebook = os.getenv("JPY_SESSION_NAME", "")
+
+    def _post_run_cell(_result=None):
+        now = _time.perf_counter()
+        state["cell"] += 1
+        _record(f"cel {state['cell']}", "cel", now - state["t"])
+        if STARTUP_REPORT:
+            _logger.info(
+                "[STARTUP] %s cel %d klaar na %.2f s (+%.2f s)",
+                notebook, state["cell"], now - _T0, now - state["t"],
+            )
+        state["t"] = now
+
+    ip.events.register("post_run_cell", _post_run_cell)
+
+
+_install_cell_timer()
+
+# ── Voorverwarmde kernels ──
+# Voila zet VOILA_PREHEAT in kernels uit de pool; die wachten nog op een gebruiker
+PREHEATED_KERNEL = os.getenv("VOILA_PREHEAT", "False") == "True"
+
+
+def wait_for_request() -> None:
+    """
+    In een voorverwarmde kernel: blokkeer tot een gebruiker de pagina opent,
+    zodat alles hierna van het moment van openen is. Anders direct terug.
+    """
+    if PREHEATED_KERNEL:
+        t0 = _time.perf_counter()
+        from voila.utils import wait_for_request as _voila_wait_for_request
+        _voila_wait_for_request()
+        _record("wachten op aanvraag", "preheat", _time.perf_counter() - t0)
+    # Pas nu is er een gebruiker: heartbeat naar de launcher
+    start_heartbeat()
+
+
+# Heartbeat naar de launcher, zodat deze server niet als ongebruikt wordt
+# gestopt zolang er een kernel draait (no-op buiten de launcher). Een kernel
+# in de pool telt pas na de aanvraag mee (zie wait_for_request).
+if not PREHEATED_KERNEL:
+    start_heartbeat()
+
 
 # UI helper functie direct in common_imports
 def show_home_button(
@@ -96,4 +295,8 @@ __all__ = [
     'get_engine',
     # UI
     'show_home_button',
+    # Opstarttijd
+    'mark', 'startup_report',
+    # Voorverwarmde kernels
+    'PREHEATED_KERNEL', 'wait_for_request',
 ]
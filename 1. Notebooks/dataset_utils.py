@@ -16,7 +16,7 @@ import logging
 import os
 import re
 from datetime import datetime
-from typing import Dict, List, Optional, Set
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
 
 import numpy as np
 import pandas as pd
@@ -29,10 +29,14 @@ from frequency_utils import (
 )
 from mappings import group_typeid_mapping
 from time_utils import DATETIME_FORMAT
+from tracing import annotate, span, traced
 from db_utils import (
     _ensure_engine,
-    fetch_full_data,
+    fetch_full_data_incremental,
     fetch_min_max_period,
+    fetch_register_info,
+    iter_full_data_chunks,
+    long_format_available,
 )
 
 logger = logging.getLogger(__name__)
@@ -42,6 +46,25 @@ logger = logging.getLogger(__name__)
 # --------------------------------------------------------------------------- #
 _registerid_pattern = re.compile(r"\((\d+)\)")
 
+# Status severity: the "worst" status of a group or time bucket is the max code.
+STATUS_LABELS = np.array(["", "T", "P"], dtype=object)
+
+
+def encode_status(values) -> np.ndarray:
+    """Map status strings to int8 codes ("" / None → 0, "T" → 1, "P" → 2)."""
+    arr = np.asarray(values, dtype=object)
+    return ((arr == "T") + 2 * (arr == "P")).astype("int8")
+
+
+def decode_status(codes) -> np.ndarray:
+    """Inverse of `encode_status`."""
+    return STATUS_LABELS[np.asarray(codes, dtype="int8")]
+
+
+def _is_status_column(col: str) -> bool:
+    low = col.lower()
+    return "(status)" in low or low.endswith(" status")
+
 
 def _map_registerids_to_typeids(df: pd.DataFrame, *, engine: Engine) -> Dict[int, int]:
     """Return {RegisterID → TypeId} for every register present in the dataframe."""
@@ -54,15 +77,108 @@ def _map_registerids_to_typeids(df: pd.DataFrame, *, engine: Engine) -> Dict[int
     if not reg_ids:
         return {}
 
-    sql = f"""
-    SELECT ID, TypeId
-    FROM dbo.TBL_Register
-    WHERE ID IN ({','.join(map(str, reg_ids))})
+    info = fetch_register_info(reg_ids, engine=engine)
+    return dict(zip(info.index, info["TypeId"]))
+
+
+class RegisterMatrix(NamedTuple):
+    """Long-format SP output pivoted to a (time × register) grid."""
+
+    index: pd.DatetimeIndex
+    register_ids: np.ndarray
+    consumption: np.ndarray
+    status: Optional[np.ndarray]
+
+
+def pivot_long_data(df_long: pd.DataFrame, *, include_status: bool = False) -> RegisterMatrix:
+    """
+    Scatter `(utcperiod, registerid, consumption, statusid)` rows into a
+    time × register matrix with NumPy.
+
+    Rows and columns come out sorted; cells without a reading are NaN (status:
+    None), just like the NULLs of the server-side PIVOT.
+    """
+    t_codes, periods = pd.factorize(df_long["utcperiod"], sort=True)
+    r_codes, reg_ids = pd.factorize(df_long["registerid"], sort=True)
+    shape = (len(periods), len(reg_ids))
+
+    consumption = np.full(shape, np.nan)
+    consumption[t_codes, r_codes] = pd.to_numeric(df_long["consumption"], errors="coerce").to_numpy(
+        dtype="float64", na_value=np.nan
+    )
+
+    status = None
+    if include_status:
+        status = np.full(shape, None, dtype=object)
+        status[t_codes, r_codes] = df_long["statusid"].to_numpy(dtype=object)
+
+    return RegisterMatrix(
+        pd.DatetimeIndex(periods, name="utcperiod"),
+        np.asarray(reg_ids, dtype="int64"),
+        consumption,
+        status,
+    )
+
+
+def _group_matrix_by_typeid(
+    matrix: RegisterMatrix,
+    reg_typeids: np.ndarray,
+    group_mapping: Dict[str, List[int]],
+    include_status: bool,
+) -> pd.DataFrame:
+    """`group_columns_by_typeid` for a `RegisterMatrix`: column masks instead of regexes."""
+    result = {"utcperiod": matrix.index}
+    for grp, tids in group_mapping.items():
+        cols = np.isin(reg_typeids, tids)
+        result[f"{grp} Total"] = np.nansum(matrix.consumption[:, cols], axis=1) if cols.any() else 0
+
+        if include_status:
+            if cols.any() and matrix.status is not None:
+                result[f"{grp} Status"] = decode_status(encode_status(matrix.status[:, cols]).max(axis=1))
+            else:
+                result[f"{grp} Status"] = ""
+
+    return pd.DataFrame(result)
+
+
+def _matrix_to_frame(matrix: RegisterMatrix, keep: np.ndarray, descriptions: np.ndarray) -> pd.DataFrame:
+    """Wide frame with the same column names as *usp_GetConnectionDataFull*."""
+    labels = [f"{desc} ({rid})" for rid, desc in zip(matrix.register_ids[keep], descriptions[keep])]
+    frames = [pd.DataFrame(matrix.consumption[:, keep], columns=[f"{lbl} (consumption)" for lbl in labels])]
+    if matrix.status is not None:
+        frames.append(pd.DataFrame(matrix.status[:, keep], columns=[f"{lbl} (status)" for lbl in labels]))
+    df = pd.concat(frames, axis=1)
+    df.insert(0, "utcperiod", matrix.index)
+    return df
+
+
+def _resample_frame(df: pd.DataFrame, pandas_freq: str) -> pd.DataFrame:
+    """
+    Resample a frame with a DatetimeIndex to `pandas_freq`: numeric columns are
+    summed, status columns keep the worst status per bucket ("" when empty).
     """
-    with engine.connect() as conn:
-        mapping_df = pd.read_sql_query(sql, conn)
+    status_cols = [c for c in df.columns if _is_status_column(c)]
+    numeric_cols = [c for c in df.columns if c not in status_cols]
+
+    out = df[numeric_cols].resample(pandas_freq).sum()
+    if status_cols:
+        # Worst status per bucket = max over int8 codes; empty buckets → ""
+        codes = pd.DataFrame(
+            encode_status(df[status_cols].to_numpy()),
+            index=df.index,
+            columns=status_cols,
+        )
+        codes = codes.resample(pandas_freq).max().reindex(out.index).fillna(0)
+        out[status_cols] = decode_status(codes.to_numpy())
+    return out[list(df.columns)]
+
 
-    return dict(zip(mapping_df["ID"], mapping_df["TypeId"]))
+def _slice_period(df: pd.DataFrame, start_date: datetime, end_date: datetime) -> pd.DataFrame:
+    """Rows with start ≤ utcperiod ≤ end; a positional slice (no copy) when sorted."""
+    ts = df["utcperiod"]
+    if ts.is_monotonic_increasing:
+        return df.iloc[ts.searchsorted(start_date, side="left") : ts.searchsorted(end_date, side="right")]
+    return df.loc[(ts >= start_date) & (ts <= end_date)]
 
 
 # --------------------------------------------------------------------------- #
@@ -88,7 +204,7 @@ def group_columns_by_typeid(
 
     regid_to_typeid = _map_registerids_to_typeids(df, engine=engine)
     result = {"utcperiod": pd.to_datetime(df["utcperiod"])}
-    df_n = df.copy()
+    df_n = df  # read-only below, no copy needed
 
     for grp, tids in group_mapping.items():
         cons_cols, status_cols = [], []
@@ -102,130 +218,251 @@ def group_columns_by_typeid(
         result[f"{grp} Total"] = df_n[cons_cols].sum(axis=1, numeric_only=True) if cons_cols else 0
 
         if include_status:
-            def _agg_status(row):
-                if any(row[status_cols] == "P"):
-                    return "P"
-                if any(row[status_cols] == "T"):
-                    return "T"
-                return ""
-
             result[f"{grp} Status"] = (
-                df_n.apply(_agg_status, axis=1) if status_cols else ""
+                decode_status(encode_status(df_n[status_cols].to_numpy()).max(axis=1))
+                if status_cols
+                else ""
             )
 
     return pd.DataFrame(result)
 
 
-def build_dataset(
+def _fetch_source(
     ean_val: str,
     chosen_groups: List[str],
     start_date: datetime,
     end_date: datetime,
     freq_val: str,
-    aggregate: bool,
     *,
-    include_status_raw: bool = False,
-    search_method: str = "transferpoint",
-    engine: Engine | None = None,
-) -> Optional[pd.DataFrame]:
+    include_status_raw: bool,
+    search_method: str,
+    long_format: bool,
+    engine: Engine,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> Tuple[Optional[pd.DataFrame], bool]:
     """
-    The notebook-level “one-liner”: validate → fetch SP data → group/resample.
+    Steps 1–3 of `build_dataset`: TypeIds → existence check → (incremental) SP
+    fetch. Shared with `warm_dataset_cache`, so both hit the same cache keys.
 
-    Always returns a dataframe containing **UTC Period** as first column
-    or `None` when no data matched.
+    Returns the frame and whether it is in long format: without a working
+    *usp_GetConnectionDataLong* (see `db_utils.long_format_available`) the
+    wide PIVOT procedure is used instead.
     """
-    engine = _ensure_engine(engine)
-
+    long_format = long_format and long_format_available()
     # 1. Resolve TypeIds for selected logical groups
     typeids = [tid for grp in chosen_groups for tid in group_typeid_mapping.get(grp, [])]
     if not typeids:
         logger.warning("build_dataset: no TypeIds found for groups %s", chosen_groups)
-        return None
+        return None, long_format
     allowed_typeids = ",".join(map(str, sorted(set(typeids))))
 
+    if progress is not None:
+        progress(0.0, "Periode met data bepalen...")
     # 2. Quick existence check (saves a heavy SP call when no data)
-    min_p, _ = fetch_min_max_period(
+    with span("fetch_min_max_period"):
+        min_p, _ = fetch_min_max_period(
+            ean_val,
+            allowed_typeids,
+            start_date,
+            end_date,
+            search_method,
+            engine=engine,
+        )
+    if min_p is None:
+        logger.info("build_dataset: no data in requested period.")
+        return None, long_format
+
+    # 3. Fetch data with the correct granularity from the SP (only the uncached delta).
+    # The SP only buckets within the hour: coarser frequencies are fetched hourly
+    # and resampled in step 5.
+    interval_minutes = min(get_freq_minutes(freq_val), 60) if freq_val.lower() != "auto" else 5
+    with span("fetch_full_data", interval_minutes=interval_minutes) as s:
+        for attempt_long in ([True, False] if long_format else [False]):
+            df = fetch_full_data_incremental(
+                ean_val,
+                allowed_typeids,
+                start_date,
+                end_date,
+                interval_minutes=interval_minutes,
+                include_status=include_status_raw,
+                search_method=search_method,
+                long_format=attempt_long,
+                engine=engine,
+                # the fetch is the bulk of the work: map it onto 5–85 %
+                progress=None if progress is None else (lambda f, msg: progress(0.05 + 0.8 * f, msg)),
+            )
+            long_format = attempt_long
+            # Retry wide only when the long procedure turned out missing during this fetch
+            if df is not None or long_format_available():
+                break
+        s.set(long_format=long_format)
+        s.set_output(df)
+    return df, long_format
+
+
+def warm_dataset_cache(
+    ean_val: str,
+    chosen_groups: List[str],
+    start_date: datetime,
+    end_date: datetime,
+    freq_val: str,
+    *,
+    include_status_raw: bool = False,
+    search_method: str = "transferpoint",
+    long_format: bool = True,
+    engine: Engine | None = None,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> bool:
+    """
+    Run only the fetch part of `build_dataset` so the caches hold its source data;
+    the later `build_dataset` with the same arguments then skips the database.
+    Returns whether there was data.
+    """
+    df_full, _ = _fetch_source(
         ean_val,
-        allowed_typeids,
+        chosen_groups,
         start_date,
         end_date,
-        search_method,
-        engine=engine,
+        freq_val,
+        include_status_raw=include_status_raw,
+        search_method=search_method,
+        long_format=long_format,
+        engine=_ensure_engine(engine),
+        progress=progress,
     )
-    if min_p is None:
-        logger.info("build_dataset: no data in requested period.")
-        return None
+    return df_full is not None and not df_full.empty
+
+
+@traced()
+def build_dataset(
+    ean_val: str,
+    chosen_groups: List[str],
+    start_date: datetime,
+    end_date: datetime,
+    freq_val: str,
+    aggregate: bool,
+    *,
+    include_status_raw: bool = False,
+    search_method: str = "transferpoint",
+    long_format: bool = True,
+    engine: Engine | None = None,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> Optional[pd.DataFrame]:
+    """
+    The notebook-level “one-liner”: validate → fetch SP data → group/resample.
+
+    Always returns a dataframe containing **UTC Period** as first column
+    or `None` when no data matched.
+
+    By default the data is fetched in long format and pivoted client-side
+    (`pivot_long_data`), so registers are matched on ID instead of parsing the
+    pivot column names; `long_format=False` uses the server-side PIVOT. So does
+    a process where *usp_GetConnectionDataLong* is switched off
+    (`USE_LONG_FORMAT=0`) or turned out not to be deployed.
+
+    `progress(fraction, message)` is called between the stages and, while
+    fetching, per period piece (see `fetch_full_data_incremental`); a callback
+    that raises (e.g. `job_runner.JobContext.progress` after a cancel) aborts
+    the build.
+
+    Every stage runs in a `tracing.span` (see `tracing.render_html`).
+    """
+    engine = _ensure_engine(engine)
+    annotate(ean=ean_val, groups=len(chosen_groups), freq=freq_val, aggregate=aggregate, long_format=long_format)
+
+    def _report(fraction: float, message: str) -> None:
+        if progress is not None:
+            progress(fraction, message)
 
-    # 3. Fetch data with the correct granularity from the SP
-    interval_minutes = get_freq_minutes(freq_val) if freq_val.lower() != "auto" else 5
-    df_full = fetch_full_data(
+    df_full, long_format = _fetch_source(
         ean_val,
-        allowed_typeids,
+        chosen_groups,
         start_date,
         end_date,
-        interval_minutes=interval_minutes,
-        include_status=include_status_raw,
+        freq_val,
+        include_status_raw=include_status_raw,
         search_method=search_method,
+        long_format=long_format,
         engine=engine,
+        progress=progress,
     )
+    _report(0.85, "Kolommen groeperen...")
     if df_full is None or df_full.empty:
         logger.info("build_dataset: SP returned no data.")
         return None
 
-    df_filtered = df_full.loc[
-        (df_full["utcperiod"] >= start_date) & (df_full["utcperiod"] <= end_date)
-    ].copy()
+    # Read-only from here on: the cached frame is sliced, never copied or mutated
+    with span("filter_period", df_full) as s:
+        df_filtered = _slice_period(df_full, start_date, end_date)
+        s.set_output(df_filtered)
     if df_filtered.empty:
         return None
 
     # 4. Column selection / grouping
-    if aggregate:
-        df_interest = group_columns_by_typeid(
-            df_filtered,
-            include_status=include_status_raw,
-            engine=engine,
-            group_mapping={g: group_typeid_mapping[g] for g in chosen_groups},
-        )
-    else:
-        df_interest = df_filtered.copy()
-        regid_to_typeid = _map_registerids_to_typeids(df_interest, engine=engine)
-        allowed_set = {tid for g in chosen_groups for tid in group_typeid_mapping[g]}
-        keep_cols = [
-            col
-            for col in df_interest.columns
-            if col.lower() == "utcperiod"
-            or (
-                (m := _registerid_pattern.search(col))
-                and regid_to_typeid.get(int(m.group(1))) in allowed_set
+    if long_format:
+        with span("pivot_long_data", df_filtered) as s:
+            matrix = pivot_long_data(df_filtered, include_status=include_status_raw)
+            s.set_output(matrix.consumption)
+        with span("fetch_register_info"):
+            info = fetch_register_info(matrix.register_ids, engine=engine)
+            reg_typeids = info["TypeId"].reindex(matrix.register_ids).to_numpy()
+        with span("group" if aggregate else "select_columns", matrix.consumption) as s:
+            if aggregate:
+                df_interest = _group_matrix_by_typeid(
+                    matrix,
+                    reg_typeids,
+                    {g: group_typeid_mapping[g] for g in chosen_groups},
+                    include_status_raw,
+                )
+            else:
+                allowed_set = [tid for g in chosen_groups for tid in group_typeid_mapping[g]]
+                df_interest = _matrix_to_frame(
+                    matrix,
+                    np.isin(reg_typeids, allowed_set),
+                    info["Description"].reindex(matrix.register_ids).to_numpy(),
+                )
+            s.set_output(df_interest)
+    elif aggregate:
+        with span("group", df_filtered) as s:
+            df_interest = group_columns_by_typeid(
+                df_filtered,
+                include_status=include_status_raw,
+                engine=engine,
+                group_mapping={g: group_typeid_mapping[g] for g in chosen_groups},
             )
-        ]
-        df_interest = df_interest[keep_cols]
+            s.set_output(df_interest)
+    else:
+        with span("map_registerids_to_typeids"):
+            regid_to_typeid = _map_registerids_to_typeids(df_filtered, engine=engine)
+        with span("select_columns", df_filtered) as s:
+            allowed_set = {tid for g in chosen_groups for tid in group_typeid_mapping[g]}
+            keep_cols = [
+                col
+                for col in df_filtered.columns
+                if col.lower() == "utcperiod"
+                or (
+                    (m := _registerid_pattern.search(col))
+                    and regid_to_typeid.get(int(m.group(1))) in allowed_set
+                )
+            ]
+            df_interest = df_filtered[keep_cols]  # column selection → new frame
+            s.set_output(df_interest)
 
     if df_interest.empty:
         return None
 
+    _report(0.95, "Resamplen...")
     # 5. Resample (status columns kept separately)
-    df_interest.set_index(pd.to_datetime(df_interest["utcperiod"]), inplace=True)
-    df_interest.drop(columns=["utcperiod"], inplace=True)
-
-    if freq_val.lower() == "auto":
-        freq_val = detect_auto_frequency(df_interest.index.sort_values())
-    pandas_freq = get_pandas_freq(freq_val) or freq_val
-
-    status_cols = [c for c in df_interest.columns if "(status)" in c.lower()]
-    numeric_cols = [c for c in df_interest.columns if c not in status_cols]
-
-    def _agg_status(series: pd.Series) -> str:
-        if (series == "P").any():
-            return "P"
-        if (series == "T").any():
-            return "T"
-        return ""
-
-    agg_map = {c: "sum" for c in numeric_cols}
-    agg_map.update({c: _agg_status for c in status_cols})
+    with span("resample", df_interest) as s:
+        df_interest.set_index(pd.to_datetime(df_interest["utcperiod"]), inplace=True)
+        df_interest.drop(columns=["utcperiod"], inplace=True)
 
-    df_resampled = df_interest.resample(pandas_freq).agg(agg_map).reset_index()
+        if freq_val.lower() == "auto":
+            freq_val = detect_auto_frequency(df_interest.index.sort_values())
+        pandas_freq = get_pandas_freq(freq_val) or freq_val
+        s.set(freq=pandas_freq)
+        df_resampled = _resample_frame(df_interest, pandas_freq).reset_index()
+        s.set_output(df_resampled)
 
     # 5a. Ensure first column is always "UTC Period"
     time_col = df_resampled.columns[0]
@@ -237,19 +474,55 @@ def build_dataset(
 # --------------------------------------------------------------------------- #
 # Export helpers
 # --------------------------------------------------------------------------- #
-def export_dataset_to_csv(df: pd.DataFrame, filename: str) -> bool:
-    """Write dataframe to CSV, formatting 'UTC Period' nicely."""
+CSV_CHUNK_ROWS = 50_000
+
+
+def _format_csv_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Format 'UTC Period' of one slice; only that slice is copied."""
+    if "UTC Period" not in chunk.columns:
+        return chunk
+    return chunk.assign(
+        **{
+            "UTC Period": pd.to_datetime(chunk["UTC Period"], errors="coerce").dt.strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+        }
+    )
+
+
+def _write_csv_chunks(chunks, filename: str) -> int:
+    """Append formatted chunks to `filename` (atomically replaced); returns the row count."""
+    tmp = f"{filename}.part"
+    rows = 0
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="") as fh:
+            for chunk in chunks:
+                _format_csv_chunk(chunk).to_csv(fh, index=False, header=rows == 0)
+                rows += len(chunk)
+        if rows:
+            os.replace(tmp, filename)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return rows
+
+
+@traced(inputs="df")
+def export_dataset_to_csv(df: pd.DataFrame, filename: str, *, chunksize: int = CSV_CHUNK_ROWS) -> bool:
+    """
+    Write dataframe to CSV, formatting 'UTC Period' nicely.
+
+    Written in slices of `chunksize` rows, so the formatted copy never exceeds
+    one slice.
+    """
     if df is None or df.empty:
         logger.warning("export_dataset_to_csv: empty dataframe")
         return False
-    df_exp = df.copy()
-    if "UTC Period" in df_exp.columns:
-        df_exp["UTC Period"] = (
-            pd.to_datetime(df_exp["UTC Period"], errors="coerce")
-            .dt.strftime("%Y-%m-%d %H:%M:%S")
-        )
     try:
-        df_exp.to_csv(filename, index=False)
+        _write_csv_chunks(
+            (df.iloc[i : i + chunksize] for i in range(0, len(df), chunksize)),
+            filename,
+        )
         logger.info("CSV exported: %s", filename)
         return True
     except Exception as exc:  # pragma: no cover
@@ -257,6 +530,132 @@ def export_dataset_to_csv(df: pd.DataFrame, filename: str) -> bool:
         return False
 
 
+@traced()
+def stream_dataset_to_csv(
+    ean_val: str,
+    chosen_groups: List[str],
+    start_date: datetime,
+    end_date: datetime,
+    freq_val: str,
+    aggregate: bool,
+    filename: str,
+    *,
+    include_status_raw: bool = False,
+    search_method: str = "transferpoint",
+    chunksize: int = CSV_CHUNK_ROWS,
+    engine: Engine | None = None,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> bool:
+    """
+    `build_dataset` + `export_dataset_to_csv` without materialising the dataset.
+
+    The SP result is read from the cursor `chunksize` rows at a time; each chunk
+    is grouped, resampled to `freq_val` (as in `build_dataset`), formatted and
+    appended to the file, so peak memory is bounded by the chunk size plus one
+    bucket. The SP only buckets within the hour, so frequencies coarser than 'H'
+    are fetched hourly and resampled here; the last bucket of a chunk is held
+    back until the next chunk has completed it. 'auto' exports the 5-minute
+    data as is.
+
+    `progress(fraction, message)` is called per chunk with the share of the
+    period written; a callback that raises aborts the export.
+    """
+    engine = _ensure_engine(engine)
+
+    typeids = [tid for grp in chosen_groups for tid in group_typeid_mapping.get(grp, [])]
+    if not typeids:
+        logger.warning("stream_dataset_to_csv: no TypeIds found for groups %s", chosen_groups)
+        return False
+    allowed_typeids = ",".join(map(str, sorted(set(typeids))))
+    if freq_val.lower() == "auto":
+        interval_minutes, pandas_freq = 5, None
+    else:
+        interval_minutes = min(get_freq_minutes(freq_val), 60)
+        pandas_freq = get_pandas_freq(freq_val) or freq_val
+    total = (end_date - start_date).total_seconds() or 1.0
+
+    groups: Dict[str, Tuple[List[str], List[str]]] = {}
+
+    def _shape(chunk: pd.DataFrame) -> pd.DataFrame:
+        # Column → group assignment only depends on the SP's column set: resolve once
+        if not groups:
+            regid_to_typeid = _map_registerids_to_typeids(chunk, engine=engine)
+            for grp in chosen_groups:
+                tids = set(group_typeid_mapping[grp])
+                cols = [
+                    c
+                    for c in chunk.columns
+                    if (m := _registerid_pattern.search(c)) and regid_to_typeid.get(int(m.group(1))) in tids
+                ]
+                groups[grp] = (
+                    [c for c in cols if "(status)" not in c.lower()],
+                    [c for c in cols if "(status)" in c.lower()],
+                )
+
+        if not aggregate:
+            wanted = {c for cons, stat in groups.values() for c in cons + stat}
+            out = chunk[["utcperiod"] + [c for c in chunk.columns if c in wanted]]
+        else:
+            out = pd.DataFrame({"utcperiod": chunk["utcperiod"]})
+            for grp, (cons, stat) in groups.items():
+                out[f"{grp} Total"] = chunk[cons].sum(axis=1, numeric_only=True) if cons else 0
+                if include_status_raw:
+                    out[f"{grp} Status"] = (
+                        decode_status(encode_status(chunk[stat].to_numpy()).max(axis=1)) if stat else ""
+                    )
+        return out.rename(columns={"utcperiod": "UTC Period"})
+
+    def _rebucket(shaped):
+        carry = None
+        for chunk in shaped:
+            frame = chunk.set_index("UTC Period")
+            if carry is not None:
+                frame = pd.concat([carry, frame])
+            # The last bucket may continue in the next chunk: write it only once complete
+            bucket = frame.groupby(pd.Grouper(freq=pandas_freq)).ngroup().to_numpy()
+            carry = frame[bucket == bucket.max()]
+            out = _resample_frame(frame, pandas_freq).iloc[:-1]
+            if not out.empty:
+                yield out.reset_index()
+        if carry is not None and not carry.empty:
+            yield _resample_frame(carry, pandas_freq).reset_index()
+
+    def _report(chunks):
+        for chunk in chunks:
+            if progress is not None:
+                last = chunk["utcperiod"].iloc[-1]
+                progress(
+                    min(max((last - start_date).total_seconds() / total, 0.0), 1.0),
+                    f"Geëxporteerd t/m {last:%d-%m-%Y %H:%M}...",
+                )
+            yield chunk
+
+    chunks = iter_full_data_chunks(
+        ean_val,
+        allowed_typeids,
+        start_date,
+        end_date,
+        interval_minutes=interval_minutes,
+        include_status=include_status_raw,
+        search_method=search_method,
+        chunksize=chunksize,
+        engine=engine,
+    )
+    shaped = (_shape(c) for c in _report(chunks))
+    try:
+        rows = _write_csv_chunks(shaped if pandas_freq is None else _rebucket(shaped), filename)
+    except Exception as exc:  # pragma: no cover
+        logger.exception("CSV stream export failed: %s", exc)
+        return False
+    if not rows:
+        logger.info("stream_dataset_to_csv: no data in requested period.")
+        return False
+    annotate(rows=rows)
+    logger.info("CSV streamed: %s (%d rows)", filename, rows)
+    return True
+
+
+@traced(inputs="df")
 def export_dataset_to_excel(
     df: pd.DataFrame,
     filename: str,
@@ -401,9 +800,15 @@ def generate_insights_html(df: pd.DataFrame) -> str:
 
 
 __all__ = [
+    "RegisterMatrix",
+    "encode_status",
+    "decode_status",
+    "pivot_long_data",
     "group_columns_by_typeid",
     "build_dataset",
+    "warm_dataset_cache",
     "export_dataset_to_csv",
+    "stream_dataset_to_csv",
     "export_dataset_to_excel",
     "get_insights_df",
     "generate_insights_html",
@@ -3,8 +3,12 @@ import os
 import sys
 import urllib.parse
 import logging
-from sqlalchemy import create_engine
-from sqlalchemy.pool import NullPool
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+import query_telemetry
 
 # --- Sanity-check voor Interpreter & dotenv-locatie ---
 try:
@@ -26,6 +30,18 @@ except ImportError:
 DEFAULT_HOST = "inn-vee-sql12"
 DEFAULT_DB   = "EDS2"
 
+# --- Pool-instellingen (overschrijfbaar via env-vars) ---
+POOL_SIZE     = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW  = int(os.getenv("DB_POOL_MAX_OVERFLOW", "5"))
+POOL_TIMEOUT  = int(os.getenv("DB_POOL_TIMEOUT", "30"))     # sec wachten op vrije connectie
+POOL_RECYCLE  = int(os.getenv("DB_POOL_RECYCLE", "1800"))   # sec; vóór SQL Server/firewall-timeouts
+
+# Proces-brede registry: één engine (en dus één pool) per connectiestring en
+# autocommit-modus, zodat transactionele en autocommit-connecties gescheiden blijven.
+_engines: dict[tuple[str, bool], Engine] = {}
+_pool_counters: dict[tuple[str, bool], dict[str, int]] = {}
+_engines_lock = threading.Lock()
+
 def _build_conn_str() -> str:
     host     = os.getenv("DB_HOST", DEFAULT_HOST)
     database = os.getenv("DB_DATABASE", DEFAULT_DB)
@@ -48,29 +64,91 @@ def _build_conn_str() -> str:
         "Encrypt=yes;TrustServerCertificate=yes;"
     )
 
-def get_engine(*, autocommit: bool = False):
-    """
-    Retourneert een SQLAlchemy-engine.
-    autocommit=True ⇒ isolation_level='AUTOCOMMIT'
-    """
-    conn_str = _build_conn_str()
+def _create_engine(conn_str: str, autocommit: bool, counters: dict[str, int]) -> Engine:
     conn = urllib.parse.quote_plus(conn_str)
 
     kwargs = {
-        "poolclass": NullPool,
+        "poolclass": QueuePool,
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": True,
         "connect_args": {"fast_executemany": True}
     }
     if autocommit:
         kwargs["isolation_level"] = "AUTOCOMMIT"
 
     engine = create_engine(f"mssql+pyodbc:///?odbc_connect={conn}", **kwargs)
+
+    def _count(name):
+        def _listener(*_args):
+            counters[name] += 1
+        return _listener
+
+    for name in ("connect", "checkout", "checkin", "invalidate"):
+        event.listen(engine.pool, name, _count(name))
+
+    # Duur, rijen en aanroeper per statement + slow-query-log (uit met QUERY_TELEMETRY=0)
+    query_telemetry.install(engine)
+
     logging.getLogger(__name__).info(
-        "SQL-engine aangemaakt voor %s/%s",
+        "SQL-engine aangemaakt voor %s/%s (pool_size=%s, max_overflow=%s, autocommit=%s)",
         os.getenv("DB_HOST", DEFAULT_HOST),
-        os.getenv("DB_DATABASE", DEFAULT_DB)
+        os.getenv("DB_DATABASE", DEFAULT_DB),
+        POOL_SIZE,
+        MAX_OVERFLOW,
+        autocommit,
     )
     return engine
 
+def get_engine(*, autocommit: bool = False) -> Engine:
+    """
+    Retourneert de proces-brede SQLAlchemy-engine met connection pool.
+
+    De engine wordt één keer per connectiestring aangemaakt en daarna hergebruikt,
+    zodat opeenvolgende calls geen ODBC-connect/TLS/auth meer betalen.
+    Connecties worden vóór gebruik gecontroleerd (pre-ping) en na
+    `DB_POOL_RECYCLE` seconden vervangen.
+    autocommit=True ⇒ aparte engine/pool met isolation_level='AUTOCOMMIT'
+    """
+    key = (_build_conn_str(), autocommit)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            counters = {"connect": 0, "checkout": 0, "checkin": 0, "invalidate": 0}
+            engine = _create_engine(key[0], autocommit, counters)
+            _engines[key] = engine
+            _pool_counters[key] = counters
+    return engine
+
+def get_pool_status() -> list[dict]:
+    """
+    Pool-metrics per engine: huidige bezetting plus cumulatieve tellers
+    (nieuwe DBAPI-connecties, checkouts/checkins en invalidaties).
+    """
+    status = []
+    with _engines_lock:
+        for (conn_str, autocommit), engine in _engines.items():
+            pool = engine.pool
+            status.append({
+                "autocommit": autocommit,
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                **_pool_counters[(conn_str, autocommit)],
+            })
+    return status
+
+def dispose_engines() -> None:
+    """Sluit alle pools (bijv. bij afsluiten van de kernel of na wijziging van .env)."""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _pool_counters.clear()
+
 # --- Test run (optioneel) ---
 if __name__ == "__main__":
     # Simpele connectie-test
@@ -80,3 +158,5 @@ if __name__ == "__main__":
             print("✅ Verbinding succesvol.")
     except Exception as e:
         print("❌ Verbindingsfout:", e)
+    else:
+        print("▶ Pool:", get_pool_status())
@@ -10,24 +10,63 @@ lives in one place, simplifying mocking and connection-pool control.
 from __future__ import annotations
 
 import logging
-from datetime import datetime
-from typing import Optional, Set, Tuple
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
+import numpy as np
 import pandas as pd
-from caching import TTLCache
+from caching import DiskCache, SingleFlight, TTLCache
 from sqlalchemy.engine import Engine
 
 from db_connection import get_engine
+from register_catalog import get_catalog
 from time_utils import DATETIME_FORMAT
+from tracing import span
 
 logger = logging.getLogger(__name__)
 
 # --------------------------------------------------------------------------- #
 # Caches (process-wide, thread-safe)
 # --------------------------------------------------------------------------- #
-_min_max_cache: TTLCache = TTLCache(ttl=300)
-_full_data_cache: TTLCache = TTLCache(ttl=300)
-_typeid_cache: TTLCache = TTLCache(ttl=300)
+# MEMORY_CACHE_MAX_MB is split between the two DataFrame caches; the metadata
+# caches hold small tuples/sets and are capped by entry count instead.
+MEMORY_CACHE_MAX_BYTES = int(os.getenv("MEMORY_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+_min_max_cache: TTLCache = TTLCache(ttl=300, max_entries=10_000)
+_full_data_cache: TTLCache = TTLCache(ttl=300, max_bytes=MEMORY_CACHE_MAX_BYTES // 2)
+_typeid_cache: TTLCache = TTLCache(ttl=300, max_entries=10_000)
+# (covered periods, stitched pivot) per series, see fetch_full_data_incremental
+_range_cache: TTLCache = TTLCache(ttl=300, max_bytes=MEMORY_CACHE_MAX_BYTES // 2)
+# Leading bucket of a window as the SP returns it for that start, see _edge_bucket
+_edge_cache: TTLCache = TTLCache(ttl=300, max_entries=10_000)
+_incremental_flights = SingleFlight()
+
+# Second tier behind _full_data_cache: Parquet files that survive kernel restarts.
+# DISK_CACHE_MAX_MB=0 disables it.
+DEFAULT_DISK_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "energieapp")
+_full_data_disk_cache: DiskCache = DiskCache(
+    os.getenv("DISK_CACHE_DIR", DEFAULT_DISK_CACHE_DIR),
+    max_bytes=int(os.getenv("DISK_CACHE_MAX_MB", "2048")) * 1024 * 1024,
+    ttl=int(os.getenv("DISK_CACHE_TTL", str(24 * 3600))),
+)
+
+# Register metadata lookups go through the in-memory catalog; USE_REGISTER_CATALOG=0
+# (or a failing catalog load) falls back to per-call queries.
+USE_REGISTER_CATALOG = os.getenv("USE_REGISTER_CATALOG", "1") != "0"
+
+# Datasets are fetched through usp_GetConnectionDataLong by default; USE_LONG_FORMAT=0
+# (or that procedure not being deployed) uses usp_GetConnectionDataFull.
+USE_LONG_FORMAT = os.getenv("USE_LONG_FORMAT", "1") != "0"
+
+# Opt-in compact representation of fetched frames (see compact_dtypes); applied
+# before caching, so it also shrinks what the memory and disk caches hold.
+COMPACT_DTYPES = os.getenv("COMPACT_DTYPES", "0") == "1"
+# float64 → float32 only when no value moves by more than this (exports show 2 decimals)
+COMPACT_FLOAT_TOLERANCE = 5e-4
+
+# SQL Server accepts at most 2100 parameters per statement; IN-lists stay below that.
+SQL_MAX_PARAMS = 2000
 
 # --------------------------------------------------------------------------- #
 # Internal
@@ -36,6 +75,63 @@ def _ensure_engine(engine: Engine | None = None) -> Engine:  # re-exported for t
     return engine or get_engine()
 
 
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return `df` with smaller dtypes: float64 → float32 where the round-trip error
+    stays within `COMPACT_FLOAT_TOLERANCE`, status strings → category and
+    integer IDs → the smallest integer type that holds them.
+    """
+    dtypes: Dict[str, Any] = {}
+    for col in df.columns:
+        s = df[col]
+        if s.dtype == "float64":
+            values = s.to_numpy()
+            err = np.abs(values.astype("float32").astype("float64") - values)
+            finite = np.isfinite(err)
+            if not finite.any() or err[finite].max() <= COMPACT_FLOAT_TOLERANCE:
+                dtypes[col] = "float32"
+        elif s.dtype == object and "status" in str(col).lower():
+            dtypes[col] = "category"
+        elif pd.api.types.is_integer_dtype(s) and len(s):
+            dtypes[col] = pd.to_numeric(s.iloc[[s.argmin(), s.argmax()]], downcast="integer").dtype
+    return df.astype(dtypes) if dtypes else df
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit/miss/eviction counters and memory use of every process-wide cache."""
+    return {
+        "min_max": _min_max_cache.stats(),
+        "full_data": _full_data_cache.stats(),
+        "typeid": _typeid_cache.stats(),
+        "range": _range_cache.stats(),
+        "edge": _edge_cache.stats(),
+    }
+
+
+def clear_caches() -> None:
+    """Empty every process-wide cache, memory and disk (e.g. for cold-cache benchmarks)."""
+    for cache in (_min_max_cache, _full_data_cache, _typeid_cache, _range_cache, _edge_cache):
+        cache.clear()
+    _full_data_disk_cache.clear()
+
+
+def warm_up(engine: Engine | None = None) -> None:
+    """
+    Prepare a fresh process before its first user request: open a pooled
+    connection and load the register catalog. Called by pre-warmed Voila
+    kernels; failures are logged, not raised (the first request is then cold).
+    """
+    engine = _ensure_engine(engine)
+    with span("warm_up"):
+        try:
+            with engine.connect() as conn:
+                conn.exec_driver_sql("SELECT 1")
+            if USE_REGISTER_CATALOG:
+                get_catalog().refresh()
+        except Exception as exc:  # pragma: no cover
+            logger.warning("Warm-up failed: %s", exc)
+
+
 # --------------------------------------------------------------------------- #
 # Public DB functions
 # --------------------------------------------------------------------------- #
@@ -48,13 +144,12 @@ def fetch_typeids_for_ean(
     """
     Return **all** `TypeId`s linked to a supplied EAN / ID.
 
-    Uses a 5-minute TTL cache to avoid hammering the catalog tables.
+    Resolved from the in-memory register catalog; without it, a 5-minute TTL
+    cache avoids hammering the catalog tables and concurrent identical lookups
+    share one query.
     """
     engine = _ensure_engine(engine)
     cache_key = (ean_value, search_method)
-    cached = _typeid_cache.get(cache_key)
-    if cached is not None:
-        return cached
 
     # ------------------------------------------------------------------- SQL
     if search_method == "transferpoint":
@@ -95,16 +190,125 @@ def fetch_typeids_for_ean(
     else:
         raise ValueError(f"Unknown search_method '{search_method}'")
 
+    if USE_REGISTER_CATALOG:
+        try:
+            return get_catalog().typeids_for_ean(ean_value, search_method)
+        except Exception as exc:  # pragma: no cover
+            logger.warning("Register catalog unavailable, querying directly: %s", exc)
+
     # -------------------------------------------------------------- Execute
-    try:
+    def _load() -> Set[int]:
         with engine.connect() as conn:
             df = pd.read_sql_query(sql, conn, params=params)
-        result: Set[int] = set(df["TypeId"].unique()) if not df.empty else set()
+        return set(df["TypeId"].unique()) if not df.empty else set()
+
+    try:
+        return _typeid_cache.get_or_compute(cache_key, _load)
     except Exception as exc:  # pragma: no cover
         logger.exception("fetch_typeids_for_ean failed: %s", exc)
-        result = set()
+        return set()
+
+
+def _typeids_sql(search_method: str, n: int) -> Tuple[str, int]:
+    """(SQL returning `EAN, TypeId` rows for `n` values, placeholders per value)."""
+    marks = ", ".join("?" * n)
+    if search_method == "transferpoint":
+        # Own connection points plus their transfer-point children
+        return (
+            f"""
+            SELECT cp.EAN_ConnectionPoint AS EAN, r.TypeId
+            FROM dbo.TBL_Register r
+            JOIN dbo.TBL_ConnectionPoint cp ON cp.ID = r.ConnectionPointId
+            WHERE cp.EAN_ConnectionPoint IN ({marks})
+            UNION
+            SELECT parent.EAN_ConnectionPoint AS EAN, r.TypeId
+            FROM dbo.TBL_Register r
+            JOIN dbo.TBL_ConnectionPoint cp ON cp.ID = r.ConnectionPointId
+            JOIN dbo.TBL_ConnectionPoint parent ON parent.ID = cp.TransferPointID
+            WHERE parent.EAN_ConnectionPoint IN ({marks})
+            """,
+            2,
+        )
+    if search_method == "objectid":
+        return (
+            f"""
+            SELECT DISTINCT src.EAN_ConnectionPoint AS EAN, r.TypeId
+            FROM dbo.TBL_ConnectionPoint src
+            JOIN dbo.TBL_ConnectionPoint cp ON cp.ObjectId = src.ObjectId
+            JOIN dbo.TBL_Register r ON r.ConnectionPointId = cp.ID
+            WHERE src.EAN_ConnectionPoint IN ({marks})
+            """,
+            1,
+        )
+    if search_method == "registerid":
+        return f"SELECT ID AS EAN, TypeId FROM dbo.TBL_Register WHERE ID IN ({marks})", 1
+    if search_method == "registratorid":
+        return (
+            f"SELECT DISTINCT RegistratorID AS EAN, TypeId FROM dbo.TBL_Register WHERE RegistratorID IN ({marks})",
+            1,
+        )
+    raise ValueError(f"Unknown search_method '{search_method}'")
+
+
+def fetch_typeids_for_eans(
+    ean_values: Iterable[str],
+    *,
+    search_method: str = "transferpoint",
+    engine: Engine | None = None,
+) -> Dict[str, Set[int]]:
+    """
+    Bulk `fetch_typeids_for_ean`: `{ean: typeids}` for a whole list.
+
+    Resolved from the register catalog in one pass; without it, the EANs not
+    yet in the TTL cache are fetched with one IN-query per `SQL_MAX_PARAMS`
+    values and stored under the same per-EAN cache keys.
+    """
+    engine = _ensure_engine(engine)
+    eans = list(dict.fromkeys(str(e).strip() for e in ean_values if str(e).strip()))
+    if not eans:
+        return {}
+    _typeids_sql(search_method, 1)  # validates search_method
+
+    if USE_REGISTER_CATALOG:
+        try:
+            return get_catalog().typeids_for_eans(eans, search_method)
+        except Exception as exc:  # pragma: no cover
+            logger.warning("Register catalog unavailable, querying directly: %s", exc)
 
-    _typeid_cache.set(cache_key, result)
+    result: Dict[str, Set[int]] = {}
+    missing: List[str] = []
+    for ean in eans:
+        cached = _typeid_cache.get((ean, search_method))
+        if cached is None:
+            missing.append(ean)
+        else:
+            result[ean] = cached
+
+    numeric = search_method in ("registerid", "registratorid")
+    chunk_size = SQL_MAX_PARAMS // _typeids_sql(search_method, 1)[1]
+    for i in range(0, len(missing), chunk_size):
+        chunk = missing[i : i + chunk_size]
+        found: Dict[str, Set[int]] = {e: set() for e in chunk}
+        # Numeric IDs come back as ints; map them back to the caller's strings
+        keys = {int(e): e for e in chunk if e.isdigit()} if numeric else {e: e for e in chunk}
+        if not keys:
+            result.update(found)
+            continue
+        sql, repeat = _typeids_sql(search_method, len(keys))
+        try:
+            with engine.connect() as conn:
+                df = pd.read_sql_query(sql, conn, params=tuple(keys) * repeat)
+        except Exception as exc:  # pragma: no cover
+            logger.exception("fetch_typeids_for_eans failed: %s", exc)
+            result.update({e: set() for e in chunk})
+            continue
+        for key, tid in df.itertuples(index=False):
+            ean = keys.get(int(key) if numeric else str(key))
+            if ean is not None:
+                found[ean].add(int(tid))
+        for ean, tids in found.items():
+            _typeid_cache.set((ean, search_method), tids)
+        result.update(found)
     return result
 
 
@@ -123,9 +327,6 @@ def fetch_min_max_period(
     """
     engine = _ensure_engine(engine)
     cache_key = (ean_value, allowed_typeids_str, start_date, end_date, search_method)
-    cached = _min_max_cache.get(cache_key)
-    if cached is not None:
-        return cached
 
     sql = """
     EXEC dbo.usp_GetMinMaxPeriodForEAN
@@ -135,7 +336,8 @@ def fetch_min_max_period(
          @EndDateStr          = ?,
          @SearchMethod        = ?
     """
-    try:
+
+    def _load() -> Tuple[Optional[datetime], Optional[datetime]]:
         with engine.connect() as conn:
             df = pd.read_sql_query(
                 sql,
@@ -149,16 +351,85 @@ def fetch_min_max_period(
                 ),
                 parse_dates=["MinUTCPeriod", "MaxUTCPeriod"],
             )
-        result = (
+        return (
             (df["MinUTCPeriod"].iloc[0], df["MaxUTCPeriod"].iloc[0])
             if not df.empty and pd.notna(df.iloc[0, 0])
             else (None, None)
         )
+
+    try:
+        return _min_max_cache.get_or_compute(cache_key, _load)
     except Exception as exc:  # pragma: no cover
         logger.exception("fetch_min_max_period failed: %s", exc)
-        result = (None, None)
+        return (None, None)
+
+
+def fetch_min_max_periods(
+    ean_values: Iterable[str],
+    allowed_typeids_str: str,
+    start_date: datetime,
+    end_date: datetime,
+    search_method: str = "transferpoint",
+    *,
+    engine: Engine | None = None,
+) -> Dict[str, Tuple[Optional[datetime], Optional[datetime]]]:
+    """
+    Batched `fetch_min_max_period`: one *usp_GetMinMaxPeriodForEANs* call for
+    every EAN not yet cached. Fills the same per-EAN cache entries, so later
+    single-EAN lookups are cache hits. Returns `{ean: (min, max)}`.
+    """
+    engine = _ensure_engine(engine)
+    eans = list(dict.fromkeys(str(e).strip() for e in ean_values if str(e).strip()))
+
+    def _key(ean: str) -> Tuple:
+        return (ean, allowed_typeids_str, start_date, end_date, search_method)
+
+    result: Dict[str, Tuple[Optional[datetime], Optional[datetime]]] = {}
+    missing: List[str] = []
+    for ean in eans:
+        cached = _min_max_cache.get(_key(ean))
+        if cached is None:
+            missing.append(ean)
+        else:
+            result[ean] = cached
+    if not missing:
+        return result
+
+    sql = """
+    EXEC dbo.usp_GetMinMaxPeriodForEANs
+         @EANList        = ?,
+         @AllowedTypeIDs = ?,
+         @StartDateStr   = ?,
+         @EndDateStr     = ?,
+         @SearchMethod   = ?
+    """
+    try:
+        with engine.connect() as conn:
+            df = pd.read_sql_query(
+                sql,
+                conn,
+                params=(
+                    ",".join(missing),
+                    allowed_typeids_str,
+                    start_date.strftime(DATETIME_FORMAT),
+                    end_date.strftime(DATETIME_FORMAT),
+                    search_method,
+                ),
+                parse_dates=["MinUTCPeriod", "MaxUTCPeriod"],
+            )
+    except Exception as exc:  # pragma: no cover
+        logger.exception("fetch_min_max_periods failed: %s", exc)
+        for ean in missing:
+            result[ean] = (None, None)
+        return result
 
-    _min_max_cache.set(cache_key, result)
+    found = {
+        str(row.EAN): (row.MinUTCPeriod, row.MaxUTCPeriod) if pd.notna(row.MinUTCPeriod) else (None, None)
+        for row in df.itertuples(index=False)
+    }
+    for ean in missing:
+        result[ean] = found.get(ean, (None, None))
+        _min_max_cache.set(_key(ean), result[ean])
     return result
 
 
@@ -171,13 +442,52 @@ def fetch_full_data(
     interval_minutes: int = 5,
     include_status: bool = False,
     search_method: str = "transferpoint",
+    long_format: bool = False,
     engine: Engine | None = None,
 ) -> Optional[pd.DataFrame]:
     """
     Execute *usp_GetConnectionDataFull* and return the **pivoted** dataframe,
     or `None` if nothing was returned.
+
+    With `long_format=True` *usp_GetConnectionDataLong* is executed instead and
+    the rows come back unpivoted as `(utcperiod, registerid, consumption,
+    statusid)`; see `dataset_utils.pivot_long_data`.
+
+    Looks in the in-process TTL cache first, then in the on-disk Parquet cache;
+    only when both miss is the stored procedure executed. Concurrent calls for
+    the same key wait for that single execution instead of starting their own.
+    Periods that end within the memory TTL of now are not written to disk.
     """
-    engine = _ensure_engine(engine)
+    try:
+        return _fetch_full_data_cached(
+            _ensure_engine(engine),
+            ean_value,
+            allowed_typeids_str,
+            start_date,
+            end_date,
+            interval_minutes,
+            include_status,
+            search_method,
+            long_format=long_format,
+        )
+    except Exception as exc:  # pragma: no cover
+        logger.exception("fetch_full_data failed: %s", exc)
+        return None
+
+
+def _fetch_full_data_cached(
+    engine: Engine,
+    ean_value: str,
+    allowed_typeids_str: str,
+    start_date: datetime,
+    end_date: datetime,
+    interval_minutes: int,
+    include_status: bool,
+    search_method: str,
+    *,
+    long_format: bool = False,
+) -> Optional[pd.DataFrame]:
+    """`fetch_full_data` without its error handling: errors other than "no data" propagate."""
     cache_key = (
         ean_value,
         allowed_typeids_str,
@@ -186,13 +496,69 @@ def fetch_full_data(
         interval_minutes,
         include_status,
         search_method,
+        long_format,
     )
-    cached = _full_data_cache.get(cache_key)
-    if cached is not None:
-        return cached
 
-    sql = """
-    EXEC dbo.usp_GetConnectionDataFull
+    def _load() -> Optional[pd.DataFrame]:
+        settled = _is_settled(end_date)
+        cached = _full_data_disk_cache.get(cache_key) if settled else None
+        if cached is not None:
+            return cached
+        try:
+            result = _execute_full_data(
+                engine,
+                ean_value,
+                allowed_typeids_str,
+                start_date,
+                end_date,
+                interval_minutes,
+                include_status,
+                search_method,
+                long_format=long_format,
+            )
+        except Exception as exc:
+            if not _is_no_data_error(exc):
+                raise
+            result = None
+        if settled:
+            _full_data_disk_cache.set(cache_key, result)
+        return result
+
+    return _full_data_cache.get_or_compute(cache_key, _load)
+
+
+def _is_settled(end_date: datetime) -> bool:
+    """
+    True when `end_date` lies further back than the memory TTL. A period up to
+    "now" still grows, so it must not outlive that TTL on disk. Compared with
+    both the local and the UTC clock (whichever is earlier), as callers pass
+    naive datetimes in either.
+    """
+    now = min(datetime.now(), datetime.now(timezone.utc).replace(tzinfo=None))
+    return end_date < now - timedelta(seconds=_full_data_cache.ttl)
+
+
+def long_format_available() -> bool:
+    """False once USE_LONG_FORMAT=0 or usp_GetConnectionDataLong turned out to be missing."""
+    return USE_LONG_FORMAT
+
+
+def _execute_full_data(
+    engine: Engine,
+    ean_value: str,
+    allowed_typeids_str: str,
+    start_date: datetime,
+    end_date: datetime,
+    interval_minutes: int,
+    include_status: bool,
+    search_method: str,
+    *,
+    long_format: bool = False,
+) -> Optional[pd.DataFrame]:
+    """Run the full-data SP uncached; errors propagate to the caller."""
+    procedure = "usp_GetConnectionDataLong" if long_format else "usp_GetConnectionDataFull"
+    sql = f"""
+    EXEC dbo.{procedure}
          @EAN_ConnectionPoint = ?,
          @AllowedTypeIDs      = ?,
          @StartDateStr        = ?,
@@ -201,8 +567,9 @@ def fetch_full_data(
          @IntervalMinutes     = ?,
          @IncludeStatus       = ?
     """
+    global USE_LONG_FORMAT
     try:
-        with engine.connect() as conn:
+        with span(procedure, start=str(start_date), end=str(end_date)) as s, engine.connect() as conn:
             df = pd.read_sql_query(
                 sql,
                 conn,
@@ -217,18 +584,355 @@ def fetch_full_data(
                 ),
                 parse_dates=["utcperiod"],
             )
-        result = None if df.empty else df
-    except Exception as exc:  # pragma: no cover
-        logger.exception("fetch_full_data failed: %s", exc)
-        result = None
+            s.set_output(df)
+    except Exception as exc:
+        if long_format and USE_LONG_FORMAT and _is_missing_procedure_error(exc):
+            # Not deployed: callers in dataset_utils retry via usp_GetConnectionDataFull
+            # (long_format_available). Other errors (timeouts, dropped connections)
+            # are transient and leave the switch alone.
+            USE_LONG_FORMAT = False
+            logger.warning("%s failed (%s); falling back to usp_GetConnectionDataFull", procedure, exc)
+        raise
+    if df.empty:
+        return None
+    return compact_dtypes(df) if COMPACT_DTYPES else df
 
-    _full_data_cache.set(cache_key, result)
-    return result
+
+def iter_full_data_chunks(
+    ean_value: str,
+    allowed_typeids_str: str,
+    start_date: datetime,
+    end_date: datetime,
+    *,
+    interval_minutes: int = 5,
+    include_status: bool = False,
+    search_method: str = "transferpoint",
+    chunksize: int = 50_000,
+    engine: Engine | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield the *usp_GetConnectionDataFull* pivot in chunks of `chunksize` rows.
+
+    Rows are fetched from the cursor as the chunks are consumed, so memory stays
+    bounded by one chunk. Nothing is cached; for a period without data the
+    generator simply yields nothing.
+    """
+    engine = _ensure_engine(engine)
+    sql = """
+    EXEC dbo.usp_GetConnectionDataFull
+         @EAN_ConnectionPoint = ?,
+         @AllowedTypeIDs      = ?,
+         @StartDateStr        = ?,
+         @EndDateStr          = ?,
+         @SearchMethod        = ?,
+         @IntervalMinutes     = ?,
+         @IncludeStatus       = ?
+    """
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True)
+        try:
+            chunks = pd.read_sql_query(
+                sql,
+                conn,
+                params=(
+                    ean_value,
+                    allowed_typeids_str,
+                    start_date.strftime(DATETIME_FORMAT),
+                    end_date.strftime(DATETIME_FORMAT),
+                    search_method,
+                    interval_minutes,
+                    int(include_status),
+                ),
+                parse_dates=["utcperiod"],
+                chunksize=chunksize,
+            )
+            for chunk in chunks:
+                if not chunk.empty:
+                    yield chunk
+        except Exception as exc:
+            if not _is_no_data_error(exc):
+                raise
+
+
+def fetch_register_info(register_ids: Iterable[int], *, engine: Engine | None = None) -> pd.DataFrame:
+    """
+    Return `TypeId` and `Description` from *TBL_Register*, indexed by register ID.
+
+    The long-format fetch path carries bare register IDs; this is its one
+    lookup for the TypeId grouping and the human-readable column names.
+    """
+    reg_ids = sorted({int(r) for r in register_ids})
+    if not reg_ids:
+        return pd.DataFrame(columns=["TypeId", "Description"], index=pd.Index([], name="ID"))
+
+    if USE_REGISTER_CATALOG:
+        try:
+            return get_catalog().register_info(reg_ids)
+        except Exception as exc:  # pragma: no cover
+            logger.warning("Register catalog unavailable, querying directly: %s", exc)
+
+    engine = _ensure_engine(engine)
+    sql = f"""
+    SELECT ID, TypeId, Description
+    FROM dbo.TBL_Register
+    WHERE ID IN ({','.join(map(str, reg_ids))})
+    """
+    with engine.connect() as conn:
+        return pd.read_sql_query(sql, conn).set_index("ID")
+
+
+# --------------------------------------------------------------------------- #
+# Range-aware incremental fetch
+# --------------------------------------------------------------------------- #
+# The SP rounds every reading *up* to the next interval border, so the last
+# bucket of a fetched range is complete and the first one only holds the reading
+# exactly on the start border. Stitching is therefore only exact for intervals
+# that divide an hour and for borders on the interval grid.
+_INCREMENTAL_INTERVALS = {5, 15, 60}
+
+# With a progress callback, uncovered ranges are fetched in pieces of at most
+# this many days, so progress is real and a cancel lands between pieces.
+PROGRESS_CHUNK_DAYS = int(os.getenv("PROGRESS_CHUNK_DAYS", "31"))
+
+
+def _is_on_grid(ts: datetime, interval_minutes: int) -> bool:
+    return ts.second == 0 and ts.microsecond == 0 and ts.minute % interval_minutes == 0
+
+
+def _missing_ranges(
+    covered: List[Tuple[datetime, datetime]],
+    start_date: datetime,
+    end_date: datetime,
+) -> List[Tuple[datetime, datetime]]:
+    """Return the sub-ranges of [start_date, end_date] not in the sorted *covered* list."""
+    missing = []
+    cursor = start_date
+    for lo, hi in covered:
+        if hi < cursor:
+            continue
+        if lo > end_date:
+            break
+        if lo > cursor:
+            missing.append((cursor, lo))
+        cursor = max(cursor, hi)
+    if cursor < end_date:
+        missing.append((cursor, end_date))
+    return missing
+
+
+def _split_range(lo: datetime, hi: datetime, days: int) -> List[Tuple[datetime, datetime]]:
+    """Split [lo, hi] into consecutive pieces of at most `days` (borders stay on the grid)."""
+    step = timedelta(days=days)
+    pieces = []
+    while lo + step < hi:
+        pieces.append((lo, lo + step))
+        lo += step
+    pieces.append((lo, hi))
+    return pieces
+
+
+def _merge_ranges(ranges: List[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+    merged: List[Tuple[datetime, datetime]] = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def _is_no_data_error(exc: Exception) -> bool:
+    """The SP signals an empty period with THROW 50001 'Geen data gevonden ...'."""
+    return "Geen data gevonden" in str(exc)
+
+
+def _is_missing_procedure_error(exc: Exception) -> bool:
+    """SQL Server error 2812: 'Could not find stored procedure ...'."""
+    msg = str(exc)
+    return "Could not find stored procedure" in msg or "(2812)" in msg
+
+
+def _edge_bucket(engine: Engine, series_key: tuple, start_date: datetime) -> pd.DataFrame:
+    """
+    Rows of the bucket at `start_date` as the SP returns them for a window that
+    starts there: it filters on `utcperiod >= start`, so that bucket only holds
+    the reading at `start_date` itself. Empty when there is none.
+    """
+    cache_key = (series_key, start_date)
+    edge = _edge_cache.get(cache_key)
+    if edge is None:
+        ean_value, allowed_typeids_str, interval_minutes, include_status, search_method, long_format = series_key
+        edge = _fetch_full_data_cached(
+            engine,
+            ean_value,
+            allowed_typeids_str,
+            start_date,
+            start_date,
+            interval_minutes,
+            include_status,
+            search_method,
+            long_format=long_format,
+        )
+        if edge is None:
+            edge = pd.DataFrame()
+        else:
+            edge = edge[edge["utcperiod"] == start_date]
+        _edge_cache.set(cache_key, edge)
+    return edge
+
+
+def fetch_full_data_incremental(
+    ean_value: str,
+    allowed_typeids_str: str,
+    start_date: datetime,
+    end_date: datetime,
+    *,
+    interval_minutes: int = 5,
+    include_status: bool = False,
+    search_method: str = "transferpoint",
+    long_format: bool = False,
+    engine: Engine | None = None,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> Optional[pd.DataFrame]:
+    """
+    Range-aware front for `fetch_full_data`.
+
+    Keeps, per EAN / TypeID set / interval / status flag / search method, one
+    stitched pivot plus the list of periods it covers. A request only fetches the
+    uncovered sub-ranges, so widening Jan–Mar to Jan–Jun fetches just Apr–Jun.
+    Each sub-range goes through the `fetch_full_data` caches (memory, disk,
+    single-flight), so after a kernel restart the same pieces come from disk. Intervals that do not divide an hour, or
+    borders off the interval grid, fall back to a plain `fetch_full_data`.
+    Long-format rows (`long_format=True`) are stitched the same way.
+
+    `progress(fraction, message)` is called before every SP call with the share
+    of the requested period already available; uncovered ranges are then fetched
+    in `PROGRESS_CHUNK_DAYS` pieces. It may raise to abort: pieces fetched so
+    far stay cached.
+
+    The result equals a direct SP call for the same window, also when it is cut
+    from a wider cached range (see `_edge_bucket`).
+    """
+    if (
+        interval_minutes not in _INCREMENTAL_INTERVALS
+        or not _is_on_grid(start_date, interval_minutes)
+        or not _is_on_grid(end_date, interval_minutes)
+    ):
+        return fetch_full_data(
+            ean_value,
+            allowed_typeids_str,
+            start_date,
+            end_date,
+            interval_minutes=interval_minutes,
+            include_status=include_status,
+            search_method=search_method,
+            long_format=long_format,
+            engine=engine,
+        )
+
+    engine = _ensure_engine(engine)
+    series_key = (ean_value, allowed_typeids_str, interval_minutes, include_status, search_method, long_format)
+
+    def _load() -> Optional[pd.DataFrame]:
+        covered, frame = _range_cache.get(series_key) or ([], None)
+
+        missing = _missing_ranges(covered, start_date, end_date)
+        if missing and progress is not None:
+            missing = [piece for lo, hi in missing for piece in _split_range(lo, hi, PROGRESS_CHUNK_DAYS)]
+        if missing:
+            pieces = [] if frame is None else [frame]
+            fetched: List[Tuple[datetime, datetime]] = []
+            total = (end_date - start_date).total_seconds() or 1.0
+            remaining = sum((hi - lo).total_seconds() for lo, hi in missing)
+            try:
+                for lo, hi in missing:
+                    if progress is not None:
+                        progress(1.0 - remaining / total, f"Periode {lo:%d-%m-%Y} – {hi:%d-%m-%Y} ophalen...")
+                    try:
+                        delta = _fetch_full_data_cached(
+                            engine,
+                            ean_value,
+                            allowed_typeids_str,
+                            lo,
+                            hi,
+                            interval_minutes,
+                            include_status,
+                            search_method,
+                            long_format=long_format,
+                        )
+                    except Exception as exc:
+                        logger.exception("fetch_full_data_incremental failed: %s", exc)
+                        return None
+                    logger.info("Incremental fetch %s: %s – %s", ean_value, lo, hi)
+
+                    # Junction borders: keep the bucket of the range that *ends* there.
+                    if delta is not None and any(c_hi == lo for _, c_hi in covered + fetched):
+                        delta = delta[delta["utcperiod"] != lo]
+                    if any(c_lo == hi for c_lo, _ in covered):
+                        pieces = [p[p["utcperiod"] != hi] for p in pieces]
+                    if delta is not None and not delta.empty:
+                        pieces.append(delta)
+                    fetched.append((lo, hi))
+                    remaining -= (hi - lo).total_seconds()
+            finally:
+                # Also on an error or abort halfway: keep what was fetched
+                if fetched:
+                    covered = _merge_ranges(covered + fetched)
+                    frame = (
+                        pd.concat(pieces, ignore_index=True)
+                        .sort_values("utcperiod", kind="stable")
+                        .reset_index(drop=True)
+                        if pieces
+                        else None
+                    )
+                    if frame is not None and COMPACT_DTYPES:
+                        # Pieces with differing categories/dtypes concat to object/float64
+                        frame = compact_dtypes(frame)
+                    _range_cache.set(series_key, (covered, frame))
+            if progress is not None:
+                progress(1.0, "Data opgehaald")
+
+        if frame is None:
+            return None
+        # frame is sorted on utcperiod: slice positionally instead of copying via a mask
+        ts = frame["utcperiod"]
+        window = frame.iloc[ts.searchsorted(start_date, side="left") : ts.searchsorted(end_date, side="right")]
+
+        # Buckets are labelled at their end, so inside a covered range the bucket at
+        # start_date holds the whole interval before it. The SP for this window only
+        # sees the reading at start_date: swap in that edge bucket.
+        if any(lo < start_date <= hi for lo, hi in covered):
+            try:
+                edge = _edge_bucket(engine, series_key, start_date)
+            except Exception as exc:
+                logger.exception("fetch_full_data_incremental failed: %s", exc)
+                return None
+            rest = window.iloc[int((window["utcperiod"] == start_date).sum()) :]
+            if not edge.empty:
+                window = pd.concat([edge.reindex(columns=window.columns), rest], ignore_index=True)
+                if COMPACT_DTYPES:
+                    window = compact_dtypes(window)
+            else:
+                window = rest
+        return None if window.empty else window
+
+    # Identical requests (double click, several widgets) share one planning pass
+    return _incremental_flights.do((series_key, start_date, end_date), _load)
 
 
 __all__ = [
     "fetch_typeids_for_ean",
+    "fetch_typeids_for_eans",
     "fetch_min_max_period",
+    "fetch_min_max_periods",
     "fetch_full_data",
+    "fetch_full_data_incremental",
+    "iter_full_data_chunks",
+    "fetch_register_info",
+    "cache_stats",
+    "clear_caches",
+    "warm_up",
+    "long_format_available",
+    "compact_dtypes",
     "_ensure_engine",
 ]
@@ -29,6 +29,16 @@ def check_max_rows(start_dt, end_dt, freq_key, max_rows=8000):
     nrows = int(duration // interval) + 1 if interval > 0 else 1
     return nrows <= max_rows, nrows
 
+# Vaste frequenties van fijn naar grof
+FREQ_ORDER = ['5T', '15T', 'H', 'D', 'W', 'ME', 'Y']
+
+def finest_freq_for_range(start_dt, end_dt, max_rows, coarsest='Y'):
+    # Fijnste frequentie waarbij het bereik binnen max_rows blijft, nooit grover dan `coarsest`
+    for freq_key in FREQ_ORDER[:FREQ_ORDER.index(coarsest) + 1]:
+        if check_max_rows(start_dt, end_dt, freq_key, max_rows)[0]:
+            return freq_key
+    return coarsest
+
 def round_datetime_to_freq(dt, freq_key, is_start, tz='Europe/Amsterdam'):
     tz_obj = pytz.timezone(tz)
     if dt.tzinfo is None:
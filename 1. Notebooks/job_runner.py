@@ -0,0 +1,236 @@
+"""
+job_runner.py
+-------------
+Background jobs for notebook widgets: supersede, cancel and real progress.
+
+A `JobRunner` belongs to one widget (e.g. the "Laad Dataset" button). Every
+`submit()` cancels the job that is still running, so a superseded request stops
+instead of keeping the database busy:
+
+• between stages – the job calls `job.progress(...)` / `job.check()`, which
+                   raise `JobCancelled` once the job is cancelled
+• in flight      – SQL statements executed on the job's threads are tracked via
+                   SQLAlchemy cursor events and cancelled on the DBAPI cursor
+                   (pyodbc `Cursor.cancel()`)
+
+Depends only on SQLAlchemy.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(BaseException):
+    """
+    Raised inside a job once it has been cancelled or superseded.
+
+    A BaseException (like `asyncio.CancelledError`), so the `except Exception`
+    fallbacks in db_utils do not turn a cancel into an empty result.
+    """
+
+
+# --------------------------------------------------------------------------- #
+# Job context
+# --------------------------------------------------------------------------- #
+_active = threading.local()
+
+
+class JobContext:
+    """
+    Handle passed to a job function. `progress(fraction, message)` reports work
+    done (0.0–1.0) and doubles as cancellation point; `cancel()` may be called
+    from any thread.
+    """
+
+    def __init__(self, name: str, on_progress: Optional[Callable[[float, str], None]] = None):
+        self.name = name
+        self.status = "running"  # running | done | cancelled | failed
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self._on_progress = on_progress
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+        self._cursors: Set[Any] = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self._finished.is_set()
+
+    def cancel(self) -> None:
+        """Stop at the next stage boundary and abort the running statement(s)."""
+        if self._cancelled.is_set():
+            return
+        self._cancelled.set()
+        with self._lock:
+            cursors = list(self._cursors)
+        for cursor in cursors:
+            try:
+                cursor.cancel()
+            except Exception as exc:  # pragma: no cover - driver specific
+                logger.debug("Cursor cancel failed for job %s: %s", self.name, exc)
+        logger.info("Job %s cancelled (%d statement(s) in flight)", self.name, len(cursors))
+
+    def check(self) -> None:
+        if self._cancelled.is_set():
+            raise JobCancelled(self.name)
+
+    def progress(self, fraction: float, message: str = "") -> None:
+        """Report progress (0.0–1.0); raises `JobCancelled` when cancelled."""
+        self.check()
+        if self._on_progress is not None:
+            self._on_progress(min(max(fraction, 0.0), 1.0), message)
+
+    def sleep(self, seconds: float) -> None:
+        """Wait `seconds`, or raise `JobCancelled` as soon as the job is cancelled."""
+        if self._cancelled.wait(seconds):
+            raise JobCancelled(self.name)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._finished.wait(timeout)
+
+    @contextmanager
+    def activate(self) -> Iterator["JobContext"]:
+        """Attribute SQL executed on the current thread to this job (for worker threads)."""
+        previous = getattr(_active, "job", None)
+        _active.job = self
+        try:
+            yield self
+        finally:
+            _active.job = previous
+
+    # -- cursor tracking (called from the engine events) --------------------
+    def _track(self, cursor: Any) -> None:
+        # Cancelled between statements: do not start a new one
+        self.check()
+        with self._lock:
+            self._cursors.add(cursor)
+
+    def _untrack(self, cursor: Any) -> None:
+        with self._lock:
+            self._cursors.discard(cursor)
+
+
+def current_job() -> Optional[JobContext]:
+    """The job running on this thread, if any."""
+    return getattr(_active, "job", None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    job = current_job()
+    if job is not None:
+        job._track(cursor)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    job = current_job()
+    if job is not None:
+        job._untrack(cursor)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    job = current_job()
+    if job is None:
+        return None
+    cursor = getattr(exception_context.execution_context, "cursor", None)
+    if cursor is not None:
+        job._untrack(cursor)
+    # The driver error of a cancelled statement ("Operation canceled") becomes JobCancelled
+    return JobCancelled(job.name) if job.cancelled else None
+
+
+# --------------------------------------------------------------------------- #
+# Runner
+# --------------------------------------------------------------------------- #
+class JobRunner:
+    """
+    Runs at most one job at a time on a daemon thread; a new `submit()`
+    supersedes (cancels) the previous job.
+
+    `fn(job, *args, **kwargs)` receives the `JobContext` as first argument. The
+    optional `on_progress(fraction, message)` is only called while the job is
+    current, so a superseded job never overwrites the progress of its successor.
+    """
+
+    def __init__(self, name: str = "job"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._current: Optional[JobContext] = None
+        self._seq = 0
+
+    @property
+    def current(self) -> Optional[JobContext]:
+        return self._current
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        on_progress: Optional[Callable[[float, str], None]] = None,
+        **kwargs: Any,
+    ) -> JobContext:
+        with self._lock:
+            if self._current is not None and not self._current.finished:
+                logger.info("Job %s superseded", self._current.name)
+                self._current.cancel()
+            self._seq += 1
+            job = JobContext(f"{self.name}#{self._seq}")
+
+            def _progress(fraction: float, message: str) -> None:
+                if on_progress is not None and self._current is job:
+                    on_progress(fraction, message)
+
+            job._on_progress = _progress
+            self._current = job
+
+        threading.Thread(target=self._run, args=(job, fn, args, kwargs), daemon=True).start()
+        return job
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._current is not None:
+                self._current.cancel()
+
+    @staticmethod
+    def _run(job: JobContext, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        with job.activate():
+            try:
+                job.result = fn(job, *args, **kwargs)
+                job.status = "cancelled" if job.cancelled else "done"
+            except JobCancelled:
+                job.status = "cancelled"
+                logger.info("Job %s stopped after cancel", job.name)
+            except Exception as exc:
+                if job.cancelled:
+                    # Typically the driver error of the cancelled statement
+                    job.status = "cancelled"
+                    logger.info("Job %s stopped after cancel: %s", job.name, exc)
+                else:
+                    job.status, job.error = "failed", exc
+                    logger.exception("Job %s failed: %s", job.name, exc)
+            finally:
+                job._finished.set()
+
+
+__all__ = [
+    "JobRunner",
+    "JobContext",
+    "JobCancelled",
+    "current_job",
+]
@@ -0,0 +1,438 @@
+"""
+notebook_servers.py
+-------------------
+On-demand Voila servers for the notebook apps.
+
+Only the main UI (000_Start_UI) is started up front. Every other notebook gets
+its Voila server when someone asks for it: the launcher runs a small control
+endpoint on `LAUNCHER_PORT`, the buttons in 000_Start_UI call
+`request_server(notebook)`, and the launcher spawns the server, waits until its
+port accepts connections and returns the URL.
+
+Kernels of a spawned server send a heartbeat to the launcher (`start_heartbeat`,
+called from common_imports). A server without heartbeat or start request for
+`LAUNCHER_IDLE_MINUTES` is shut down; Voila itself culls kernels whose browser
+tab is gone after the same time, so an abandoned app stops on its own.
+
+Notebooks in `KERNEL_POOLS` run with a pool of pre-warmed kernels (Voila
+`--preheat_kernel`): imports, engine, register catalog and the widget tree are
+ready before anyone connects, and a request is handed a finished kernel. Such
+notebooks call `common_imports.wait_for_request()` before anything that must
+reflect the moment of opening; pooled kernels heartbeat only after that.
+
+    python notebook_servers.py [--ip 0.0.0.0] [--log-dir logs]
+
+runs the same thing without the Tk window (Docker entry point).
+
+Depends only on the standard library; `voila` must be on PATH.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+NOTEBOOKS: Dict[str, int] = {
+    "000_Start_UI.ipynb": int(os.getenv("PORT", "8868")),  # main UI
+    "001_All_Types.ipynb": 8866,
+    "002_Data_export.ipynb": 8867,
+    "003_VMNED_Data_Export.ipynb": 8869,
+    "004_Factorupdate.ipynb": 8870,
+    "005_MV_Switch.ipynb": 8871,
+    "006_Vervanging_Tool.ipynb": 8872,
+    "007_Storage_Method.ipynb": 8873,
+}
+MAIN_UI_NOTEBOOK = "000_Start_UI.ipynb"
+MAIN_UI_PORT = NOTEBOOKS[MAIN_UI_NOTEBOOK]
+
+HOST = "127.0.0.1"
+# Control endpoint of the launcher (start requests, heartbeats, status)
+CONTROL_PORT = int(os.getenv("LAUNCHER_PORT", "8865"))
+# Minutes without heartbeat or start request before a server is stopped (0 = never)
+IDLE_MINUTES = float(os.getenv("LAUNCHER_IDLE_MINUTES", "15"))
+# Seconds a freshly spawned server gets to open its port
+START_TIMEOUT = float(os.getenv("LAUNCHER_START_TIMEOUT", "90"))
+# Pre-warmed kernels per notebook; VOILA_POOL_SIZE overrides the sizes (0 = off).
+# Only for notebooks that call wait_for_request(), see the module docstring.
+KERNEL_POOLS: Dict[str, int] = {
+    "001_All_Types.ipynb": 2,
+    "002_Data_export.ipynb": 2,
+}
+if os.getenv("VOILA_POOL_SIZE"):
+    KERNEL_POOLS = {nb: int(os.environ["VOILA_POOL_SIZE"]) for nb in KERNEL_POOLS}
+HEARTBEAT_SECONDS = 30
+_REAP_INTERVAL = 30
+
+
+def app_url(port: int) -> str:
+    return f"http://{HOST}:{port}"
+
+
+def is_port_open(host: str, port: int, timeout: float = 1) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        return sock.connect_ex((host, port)) == 0
+
+
+# --------------------------------------------------------------------------- #
+# Launcher side
+# --------------------------------------------------------------------------- #
+class _Server:
+    """A Voila process started by the manager."""
+
+    __slots__ = ("notebook", "port", "proc", "log", "started_at", "last_seen")
+
+    def __init__(self, notebook: str, port: int, proc: subprocess.Popen, log):
+        self.notebook = notebook
+        self.port = port
+        self.proc = proc
+        self.log = log
+        self.started_at = self.last_seen = time.time()
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+
+class ServerManager:
+    """
+    Spawns Voila servers on demand, health-checks them by port and stops the
+    ones that have been idle for `idle_seconds`. The main UI is never stopped.
+    """
+
+    def __init__(
+        self,
+        notebook_dir: str,
+        *,
+        log_dir: Optional[str] = None,
+        ip: str = HOST,
+        idle_seconds: float = IDLE_MINUTES * 60,
+        control_port: int = CONTROL_PORT,
+    ):
+        self.notebook_dir = os.path.abspath(notebook_dir)
+        self.log_dir = log_dir
+        self.ip = ip
+        self.idle_seconds = idle_seconds
+        self.control_port = control_port
+        self._servers: Dict[str, _Server] = {}
+        self._locks = {nb: threading.Lock() for nb in NOTEBOOKS}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+
+    # ---------------------------------------------------------------- spawning
+    def missing_notebooks(self) -> List[str]:
+        return [nb for nb in NOTEBOOKS if not os.path.isfile(os.path.join(self.notebook_dir, nb))]
+
+    def _spawn(self, notebook: str, port: int) -> _Server:
+        cmd = [
+            "voila",
+            notebook,
+            f"--port={port}",
+            "--no-browser",
+            f"--ip={self.ip}",
+        ]
+        pool_size = KERNEL_POOLS.get(notebook, 0)
+        if pool_size > 0:
+            cmd += ["--preheat_kernel=True", f"--pool_size={pool_size}"]
+        if self.idle_seconds > 0:
+            # Kernels without a browser connection go after the same idle time
+            # (Voila's preheat kernel manager leaves the waiting pool kernels alone)
+            cmd += [
+                f"--MappingKernelManager.cull_idle_timeout={int(self.idle_seconds)}",
+                f"--MappingKernelManager.cull_interval={_REAP_INTERVAL}",
+            ]
+        env = dict(
+            os.environ,
+            LAUNCHER_URL=f"http://{HOST}:{self.control_port}",
+            LAUNCHER_APP_PORT=str(port),
+        )
+        if self.log_dir:
+            os.makedirs(self.log_dir, exist_ok=True)
+            log = open(os.path.join(self.log_dir, f"{notebook[:-len('.ipynb')]}.log"), "ab")
+        else:
+            log = subprocess.DEVNULL
+        logger.info("[INFO] Launching %s on port %s with: %s", notebook, port, " ".join(cmd))
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, cwd=self.notebook_dir, env=env)
+        return _Server(notebook, port, proc, log)
+
+    def ensure_running(self, notebook: str, timeout: float = START_TIMEOUT) -> str:
+        """
+        URL of `notebook`'s server, spawning it first when needed; blocks until
+        the port accepts connections. Raises KeyError for unknown notebooks and
+        RuntimeError when the server exits or does not come up in time.
+        """
+        port = NOTEBOOKS[notebook]
+        with self._locks[notebook]:
+            with self._lock:
+                server = self._servers.get(notebook)
+            if server is not None and server.alive:
+                server.last_seen = time.time()
+                if is_port_open(HOST, port):
+                    return app_url(port)
+            elif is_port_open(HOST, port):
+                # Started outside this launcher (earlier session, by hand): use as-is
+                return app_url(port)
+            else:
+                if server is not None:
+                    self._close(server)
+                server = self._spawn(notebook, port)
+                with self._lock:
+                    self._servers[notebook] = server
+
+            deadline = time.monotonic() + timeout
+            while not is_port_open(HOST, port):
+                if not server.alive:
+                    with self._lock:
+                        self._servers.pop(notebook, None)
+                    self._close(server)
+                    raise RuntimeError(f"{notebook} stopped during start-up (exit code {server.proc.returncode})")
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{notebook} did not open port {port} within {timeout:.0f} s")
+                time.sleep(0.25)
+            server.last_seen = time.time()
+            logger.info("[INFO] %s ready on port %s after %.1f s", notebook, port, time.time() - server.started_at)
+            return app_url(port)
+
+    # ---------------------------------------------------------------- stopping
+    @staticmethod
+    def _close(server: _Server) -> None:
+        if server.alive:
+            server.proc.terminate()
+            try:
+                server.proc.wait(10)
+            except subprocess.TimeoutExpired:
+                server.proc.kill()
+                server.proc.wait()
+        if server.log is not subprocess.DEVNULL:
+            server.log.close()
+
+    def stop(self, notebook: str) -> bool:
+        with self._lock:
+            server = self._servers.pop(notebook, None)
+        if server is None:
+            return False
+        logger.info("[INFO] Stopping %s (port %s)", notebook, server.port)
+        self._close(server)
+        return True
+
+    def stop_all(self) -> None:
+        self._stopping.set()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+        for notebook in list(self._servers):
+            self.stop(notebook)
+
+    def touch(self, port: int) -> None:
+        """Heartbeat from a kernel of the server on `port`."""
+        with self._lock:
+            for server in self._servers.values():
+                if server.port == port:
+                    server.last_seen = time.time()
+
+    def reap_idle(self) -> List[str]:
+        """Stop idle and drop exited servers; returns the notebooks that were stopped."""
+        now = time.time()
+        stopped = []
+        with self._lock:
+            servers = list(self._servers.values())
+        for server in servers:
+            if not server.alive:
+                with self._lock:
+                    self._servers.pop(server.notebook, None)
+                self._close(server)
+            elif (
+                server.notebook != MAIN_UI_NOTEBOOK
+                and self.idle_seconds > 0
+                and now - server.last_seen > self.idle_seconds
+                # not while a start request for it is in progress
+                and self._locks[server.notebook].acquire(blocking=False)
+            ):
+                try:
+                    if self.stop(server.notebook):
+                        stopped.append(server.notebook)
+                finally:
+                    self._locks[server.notebook].release()
+        return stopped
+
+    def status(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            servers = list(self._servers.values())
+        return [
+            {
+                "notebook": s.notebook,
+                "port": s.port,
+                "alive": s.alive,
+                "uptime_s": round(now - s.started_at),
+                "idle_s": round(now - s.last_seen),
+            }
+            for s in servers
+        ]
+
+    def running(self) -> List[str]:
+        return [s["notebook"] for s in self.status() if s["alive"]]
+
+    # ---------------------------------------------------------------- control
+    def serve(self) -> None:
+        """Start the control endpoint and the idle reaper in daemon threads."""
+        manager = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                query = dict(urllib.parse.parse_qsl(url.query))
+                if url.path == "/start":
+                    notebook = query.get("notebook", "")
+                    if notebook not in NOTEBOOKS:
+                        return self._reply(404, {"error": f"unknown notebook '{notebook}'"})
+                    try:
+                        return self._reply(200, {"url": manager.ensure_running(notebook)})
+                    except RuntimeError as exc:
+                        return self._reply(503, {"error": str(exc)})
+                if url.path == "/ping":
+                    manager.touch(int(query.get("port", 0)))
+                    return self._reply(200, {})
+                if url.path == "/status":
+                    return self._reply(200, manager.status())
+                return self._reply(404, {"error": "not found"})
+
+            def _reply(self, code: int, payload) -> None:
+                body = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                logger.debug("control: " + fmt, *args)
+
+        self._httpd = ThreadingHTTPServer((HOST, self.control_port), _Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, name="launcher-control", daemon=True).start()
+        threading.Thread(target=self._reap_loop, name="launcher-reaper", daemon=True).start()
+
+    def _reap_loop(self) -> None:
+        while not self._stopping.wait(_REAP_INTERVAL):
+            for notebook in self.reap_idle():
+                logger.info("[INFO] %s idle for %.0f min; stopped", notebook, self.idle_seconds / 60)
+
+
+# --------------------------------------------------------------------------- #
+# Notebook side
+# --------------------------------------------------------------------------- #
+def _launcher_url() -> str:
+    return os.getenv("LAUNCHER_URL", f"http://{HOST}:{CONTROL_PORT}")
+
+
+def request_server(notebook: str, timeout: float = START_TIMEOUT) -> str:
+    """
+    Ask the launcher to start `notebook` and return its URL once it is up.
+    Without a reachable launcher (servers started by hand) the fixed URL is
+    returned as before. Raises RuntimeError when the launcher cannot start it.
+    """
+    query = urllib.parse.urlencode({"notebook": notebook})
+    try:
+        with urllib.request.urlopen(f"{_launcher_url()}/start?{query}", timeout=timeout + 5) as resp:
+            return json.load(resp)["url"]
+    except urllib.error.HTTPError as exc:
+        try:
+            message = json.load(exc).get("error", str(exc))
+        except ValueError:
+            message = str(exc)
+        raise RuntimeError(message) from exc
+    except (urllib.error.URLError, OSError) as exc:
+        logger.debug("Launcher not reachable (%s); using fixed URL", exc)
+        return app_url(NOTEBOOKS[notebook])
+
+
+_heartbeat_started = False
+
+
+def start_heartbeat() -> None:
+    """
+    Report this kernel to the launcher every HEARTBEAT_SECONDS so its server
+    is not stopped as idle. No-op outside a server spawned by the launcher.
+    """
+    global _heartbeat_started
+    port = os.getenv("LAUNCHER_APP_PORT")
+    if not port or _heartbeat_started:
+        return
+    _heartbeat_started = True
+    url = f"{_launcher_url()}/ping?port={port}"
+
+    def _beat():
+        while True:
+            try:
+                urllib.request.urlopen(url, timeout=5).close()
+            except OSError:
+                pass  # launcher gone or busy; the next beat tries again
+            time.sleep(HEARTBEAT_SECONDS)
+
+    threading.Thread(target=_beat, name="launcher-heartbeat", daemon=True).start()
+
+
+# --------------------------------------------------------------------------- #
+# Headless entry point
+# --------------------------------------------------------------------------- #
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Main UI plus on-demand Voila servers for the other notebooks.")
+    parser.add_argument("--ip", default=HOST, help="interface the Voila servers listen on")
+    parser.add_argument("--log-dir", default="", help="write one log file per notebook here")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    manager = ServerManager(os.path.dirname(os.path.abspath(__file__)), log_dir=args.log_dir or None, ip=args.ip)
+    missing = manager.missing_notebooks()
+    if missing:
+        logger.error("[ERROR] Missing notebook(s) in %s: %s", manager.notebook_dir, ", ".join(missing))
+        return 1
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    manager.serve()
+    try:
+        manager.ensure_running(MAIN_UI_NOTEBOOK)
+        logger.info("[INFO] Main UI live at %s; other notebooks start on demand", app_url(MAIN_UI_PORT))
+        while not stop.wait(2):
+            if not is_port_open(HOST, MAIN_UI_PORT):
+                logger.error("[ERROR] %s has exited; shutting down", MAIN_UI_NOTEBOOK)
+                return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.stop_all()
+    return 0
+
+
+__all__ = [
+    "NOTEBOOKS",
+    "KERNEL_POOLS",
+    "MAIN_UI_NOTEBOOK",
+    "MAIN_UI_PORT",
+    "ServerManager",
+    "app_url",
+    "is_port_open",
+    "request_server",
+    "start_heartbeat",
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,132 @@
+# paged_table_widget.py
+
+import ipywidgets as widgets
+import numpy as np
+
+class PagedTableWidget:
+    """
+    Server-side gepagineerde tabel voor (zeer) grote DataFrames.
+    De DataFrame blijft in de kernel; per klik wordt alleen de zichtbare pagina
+    als HTML naar de browser gestuurd. Sorteren gebeurt op verzoek in de kernel,
+    dus bekijken kost evenveel voor 10k als voor 1M rijen.
+    """
+
+    def __init__(self, page_size=50, page_sizes=(25, 50, 100, 250), max_height="380px"):
+        button_layout = widgets.Layout(width='40px', height='30px')
+        self.first_button = widgets.Button(icon='angle-double-left', tooltip="Eerste pagina", layout=button_layout)
+        self.prev_button = widgets.Button(icon='angle-left', tooltip="Vorige pagina", layout=button_layout)
+        self.next_button = widgets.Button(icon='angle-right', tooltip="Volgende pagina", layout=button_layout)
+        self.last_button = widgets.Button(icon='angle-double-right', tooltip="Laatste pagina", layout=button_layout)
+        self.page_label = widgets.Label(value="", layout=widgets.Layout(width='auto', margin="0 10px"))
+        self.page_size_dropdown = widgets.Dropdown(
+            options=list(page_sizes),
+            value=page_size if page_size in page_sizes else page_sizes[0],
+            description="Rijen:",
+            layout=widgets.Layout(width='150px')
+        )
+        self.sort_dropdown = widgets.Dropdown(
+            options=[("(geen)", None)],
+            value=None,
+            description="Sorteer:",
+            layout=widgets.Layout(width='320px')
+        )
+        self.sort_desc_toggle = widgets.ToggleButton(
+            value=False,
+            icon='sort-amount-asc',
+            tooltip="Aflopend sorteren",
+            layout=widgets.Layout(width='40px', height='30px')
+        )
+        self.table_html = widgets.HTML(value="")
+        self.container = widgets.VBox([
+            widgets.HBox(
+                [self.first_button, self.prev_button, self.page_label, self.next_button, self.last_button,
+                 self.page_size_dropdown, self.sort_dropdown, self.sort_desc_toggle],
+                layout=widgets.Layout(align_items='center', gap="5px", flex_flow="row wrap")
+            ),
+            widgets.Box([self.table_html], layout=widgets.Layout(overflow='auto', max_height=max_height, width='100%'))
+        ])
+
+        self._df = None
+        self._page = 0
+        self._order = None
+        self._order_key = None
+
+        self.first_button.on_click(lambda b: self._goto(0))
+        self.prev_button.on_click(lambda b: self._goto(self._page - 1))
+        self.next_button.on_click(lambda b: self._goto(self._page + 1))
+        self.last_button.on_click(lambda b: self._goto(self._page_count() - 1))
+        self.page_size_dropdown.observe(lambda change: self._goto(0), names="value")
+        self.sort_dropdown.observe(lambda change: self._goto(0), names="value")
+        self.sort_desc_toggle.observe(self._on_sort_direction, names="value")
+
+    def widget(self):
+        """
+        Retourneert de VBox-widget die toegevoegd kan worden aan je UI-lay-out.
+        """
+        return self.container
+
+    def set_dataframe(self, df):
+        """
+        Koppel een (nieuwe) DataFrame; er wordt niets gekopieerd of naar de browser gestuurd
+        behalve de eerste pagina.
+        """
+        self._df = df
+        self._order = None
+        self._order_key = None
+        with self.sort_dropdown.hold_trait_notifications():
+            self.sort_dropdown.options = [("(geen)", None)] + [(str(col), col) for col in df.columns]
+            self.sort_dropdown.value = None
+        self._goto(0)
+
+    def _page_count(self):
+        if self._df is None or len(self._df) == 0:
+            return 1
+        return -(-len(self._df) // self.page_size_dropdown.value)
+
+    def _row_order(self):
+        """
+        Rijposities in sorteervolgorde (None = oorspronkelijke volgorde); per kolom/richting
+        één keer berekend, daarna is elke pagina een goedkope slice.
+        """
+        column = self.sort_dropdown.value
+        if column is None:
+            return None
+        key = (column, self.sort_desc_toggle.value)
+        if key != self._order_key:
+            series = self._df[column].reset_index(drop=True)
+            self._order = series.sort_values(
+                ascending=not self.sort_desc_toggle.value, kind="stable", na_position="last"
+            ).index.to_numpy()
+            self._order_key = key
+        return self._order
+
+    def _on_sort_direction(self, change):
+        self.sort_desc_toggle.icon = 'sort-amount-desc' if change["new"] else 'sort-amount-asc'
+        self._goto(0)
+
+    def _goto(self, page):
+        if self._df is None:
+            return
+        n_rows = len(self._df)
+        page_size = self.page_size_dropdown.value
+        self._page = min(max(page, 0), self._page_count() - 1)
+        start = self._page * page_size
+        stop = min(start + page_size, n_rows)
+
+        order = self._row_order()
+        positions = np.arange(start, stop) if order is None else order[start:stop]
+        page_df = self._df.iloc[positions]
+
+        self.table_html.value = page_df.to_html(classes="dataframe", index=False, escape=True)
+        self.page_label.value = (
+            f"Rij {start + 1 if n_rows else 0}–{stop} van {n_rows} "
+            f"(pagina {self._page + 1}/{self._page_count()})"
+        )
+        self.first_button.disabled = self.prev_button.disabled = self._page == 0
+        self.next_button.disabled = self.last_button.disabled = self._page >= self._page_count() - 1
+
+# Gebruik:
+# from paged_table_widget import PagedTableWidget
+# table = PagedTableWidget(page_size=50)
+# table.set_dataframe(df)
+# display(table.widget())
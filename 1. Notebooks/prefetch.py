@@ -0,0 +1,164 @@
+"""
+prefetch.py
+-----------
+Speculative, idle-time warm-up of the dataset caches.
+
+After "Laad filters" the user nearly always generates the chart for the same
+EAN, period and (default) groups within seconds. `Prefetcher.schedule()` starts
+that fetch in the background (`dataset_utils.warm_dataset_cache`), so the real
+`build_dataset` call usually finds everything in the caches.
+
+A prefetch never competes with foreground work:
+
+• at most PREFETCH_MAX_CONCURRENT prefetches run per process; more are dropped
+• it only starts when the connection pool has spare connections
+• every period piece re-checks the pool and gives up when it is busy
+• `yield_to(...)` (called by the foreground request) cancels a prefetch for a
+  *different* request; one for the same request keeps running and the
+  foreground call joins it through the single-flight caches
+
+Depends on job_runner and dataset_utils.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy.engine import Engine
+
+from dataset_utils import warm_dataset_cache
+from job_runner import JobCancelled, JobContext, JobRunner
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = os.getenv("PREFETCH", "1") != "0"
+# Seconds the UI must be idle after scheduling before the prefetch starts
+PREFETCH_DELAY = float(os.getenv("PREFETCH_DELAY", "1.0"))
+PREFETCH_MAX_CONCURRENT = int(os.getenv("PREFETCH_MAX_CONCURRENT", "1"))
+# Connections kept free for foreground requests
+PREFETCH_POOL_RESERVE = 2
+
+_slots = threading.BoundedSemaphore(max(1, PREFETCH_MAX_CONCURRENT))
+
+
+def _pool_busy(engine: Optional[Engine]) -> bool:
+    pool = getattr(engine, "pool", None)
+    if pool is None or not hasattr(pool, "size"):
+        return False
+    return pool.checkedout() > pool.size() - PREFETCH_POOL_RESERVE
+
+
+class Prefetcher:
+    """
+    One prefetcher per notebook; a new `schedule()` supersedes the previous one.
+    Arguments are those of `build_dataset` (without `aggregate`, which does not
+    influence what is fetched).
+    """
+
+    def __init__(self, engine: Engine | None = None, *, delay: float = PREFETCH_DELAY):
+        self.engine = engine
+        self.delay = delay
+        self._runner = JobRunner("prefetch")
+        self._request: Optional[Tuple] = None
+        self.stats = {"scheduled": 0, "completed": 0, "skipped": 0, "cancelled": 0}
+
+    @staticmethod
+    def _key(ean_val, chosen_groups, start_date, end_date, freq_val, include_status_raw, search_method) -> Tuple:
+        return (ean_val, tuple(sorted(chosen_groups)), start_date, end_date, freq_val, include_status_raw, search_method)
+
+    def schedule(
+        self,
+        ean_val: str,
+        chosen_groups: List[str],
+        start_date: datetime,
+        end_date: datetime,
+        freq_val: str,
+        *,
+        include_status_raw: bool = False,
+        search_method: str = "transferpoint",
+    ) -> None:
+        if not PREFETCH_ENABLED or not ean_val or not chosen_groups or start_date is None or end_date is None:
+            return
+        self._request = self._key(ean_val, chosen_groups, start_date, end_date, freq_val, include_status_raw, search_method)
+        self.stats["scheduled"] += 1
+        self._runner.submit(
+            self._run,
+            ean_val,
+            list(chosen_groups),
+            start_date,
+            end_date,
+            freq_val,
+            include_status_raw=include_status_raw,
+            search_method=search_method,
+        )
+
+    def yield_to(
+        self,
+        ean_val: str,
+        chosen_groups: List[str],
+        start_date: datetime,
+        end_date: datetime,
+        freq_val: str,
+        *,
+        include_status_raw: bool = False,
+        search_method: str = "transferpoint",
+    ) -> None:
+        """Foreground request starts: cancel the prefetch unless it is for this request."""
+        key = self._key(ean_val, chosen_groups, start_date, end_date, freq_val, include_status_raw, search_method)
+        if key != self._request:
+            self.cancel()
+
+    def cancel(self) -> None:
+        self._request = None
+        self._runner.cancel()
+
+    def _run(self, job: JobContext, ean_val, chosen_groups, start_date, end_date, freq_val, **kwargs) -> None:
+        # Idle wait: a quick second click (or a foreground request) supersedes us first
+        try:
+            job.sleep(self.delay)
+        except JobCancelled:
+            self.stats["cancelled"] += 1
+            raise
+        if _pool_busy(self.engine) or not _slots.acquire(blocking=False):
+            self.stats["skipped"] += 1
+            logger.debug("Prefetch %s skipped: no spare capacity", ean_val)
+            return
+
+        def _yield(fraction: float, message: str) -> None:
+            job.check()
+            if _pool_busy(self.engine):
+                raise JobCancelled("pool busy")
+
+        started = time.perf_counter()
+        try:
+            has_data = warm_dataset_cache(
+                ean_val,
+                chosen_groups,
+                start_date,
+                end_date,
+                freq_val,
+                engine=self.engine,
+                progress=_yield,
+                **kwargs,
+            )
+            self.stats["completed"] += 1
+            logger.info(
+                "Prefetch %s %s – %s done in %.1fs (data: %s)",
+                ean_val, start_date, end_date, time.perf_counter() - started, has_data,
+            )
+        except JobCancelled:
+            self.stats["cancelled"] += 1
+            raise
+        finally:
+            _slots.release()
+
+
+__all__ = [
+    "Prefetcher",
+    "PREFETCH_ENABLED",
+]
@@ -0,0 +1,378 @@
+"""
+query_telemetry.py
+------------------
+Per-statement telemetry for SQLAlchemy engines, hooked in through engine
+events so every `pd.read_sql_query` / `conn.execute` is covered without
+touching the call sites.
+
+Per statement:
+• duration (execute) and fetch time, rows returned, approximate bytes
+• the parameters, redacted (strings become `<str len=N>`)
+• the calling function outside SQLAlchemy/pandas, plus the `tracing` span path
+
+Statements are grouped on a key (the procedure name for `EXEC dbo.…`, else
+the normalised SQL text) with a rolling window for percentiles. Statements
+slower than `SLOW_QUERY_SECONDS` go to the slow-query log (in memory, WARNING
+log, optionally appended to `SLOW_QUERY_LOG` as JSON lines). `export()` writes
+summary plus slow log to one JSON file for capacity planning; with
+`QUERY_TELEMETRY_EXPORT` that happens automatically at exit.
+
+Depends only on SQLAlchemy and `tracing`.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import date, datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from tracing import current_span
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_ENABLED = os.getenv("QUERY_TELEMETRY", "1") != "0"
+# Executions kept per statement key for the percentiles
+WINDOW = int(os.getenv("QUERY_TELEMETRY_WINDOW", "1000"))
+# Execute + fetch time (seconds) from which a statement counts as slow
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", "2.0"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "")  # JSON-lines file, appended per slow query
+SLOW_LOG_SIZE = 500
+# "0" logs string parameters verbatim (local debugging only)
+REDACT_PARAMS = os.getenv("QUERY_TELEMETRY_REDACT", "1") != "0"
+# When set, `export()` runs to this file at interpreter exit (e.g. per Voila kernel)
+EXPORT_ON_EXIT = os.getenv("QUERY_TELEMETRY_EXPORT", "")
+
+_SQL_PREVIEW = 500
+_exec_pattern = re.compile(r"^\s*EXEC(?:UTE)?\s+(?:\[?dbo\]?\.)?\[?(\w+)", re.IGNORECASE)
+_ws_pattern = re.compile(r"\s+")
+# Frames from these packages are skipped when looking for the caller
+_SKIP_MODULES = ("sqlalchemy", "pandas", "query_telemetry", "caching", "contextlib", "threading", "concurrent")
+
+
+# --------------------------------------------------------------------------- #
+# Helpers
+# --------------------------------------------------------------------------- #
+def statement_key(statement: str) -> str:
+    """Grouping key: `EXEC usp_X` for procedure calls, otherwise the first 120 chars of normalised SQL."""
+    m = _exec_pattern.match(statement)
+    if m:
+        return f"EXEC {m.group(1)}"
+    return _ws_pattern.sub(" ", statement).strip()[:120]
+
+
+def redact(value: Any) -> Any:
+    """JSON-safe, redacted parameter: numbers/dates as-is, strings as their length."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value[:200] if not REDACT_PARAMS else f"<str len={len(value)}>"
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    if isinstance(value, dict):
+        return {k: redact(v) for k, v in value.items()}
+    return f"<{type(value).__name__}>"
+
+
+def _caller() -> str:
+    """`module.function:line` of the first frame outside the database stack."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if not module.split(".")[0] in _SKIP_MODULES:
+            return f"{module}.{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return "?"
+
+
+def _row_bytes(row) -> int:
+    """Rough size of one row: the payload of its values."""
+    size = 0
+    for v in row:
+        if isinstance(v, (str, bytes)):
+            size += len(v)
+        elif v is not None:
+            size += 8
+    return size
+
+
+def _quantile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+# --------------------------------------------------------------------------- #
+# Records
+# --------------------------------------------------------------------------- #
+class QueryRecord:
+    """One statement execution; finished when its cursor is closed."""
+
+    __slots__ = (
+        "key",
+        "sql",
+        "params",
+        "caller",
+        "span",
+        "started_at",
+        "duration",
+        "fetch",
+        "rows",
+        "bytes",
+        "error",
+        "_t0",
+        "_done",
+    )
+
+    def __init__(self, statement: str, parameters: Any, executemany: bool):
+        self.key = statement_key(statement)
+        self.sql = statement.strip()[:_SQL_PREVIEW]
+        # executemany: only the batch size, not every row of parameters
+        self.params = f"<{len(parameters)} sets>" if executemany else redact(parameters)
+        self.caller = _caller()
+        s = current_span()
+        self.span = s.path if s is not None else None
+        self.started_at = time.time()
+        self.duration = self.fetch = 0.0
+        self.rows = self.bytes = 0
+        self.error: Optional[str] = None
+        self._t0 = time.perf_counter()
+        self._done = False
+
+    @property
+    def total(self) -> float:
+        return self.duration + self.fetch
+
+    def add_rows(self, rows) -> None:
+        if rows:
+            self.rows += len(rows)
+            # first row as sample: exact sizes would cost more than the fetch itself
+            self.bytes += _row_bytes(rows[0]) * len(rows)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "statement": self.key,
+            "sql": self.sql,
+            "params": self.params,
+            "caller": self.caller,
+            "span": self.span,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="milliseconds"),
+            "duration_s": round(self.duration, 4),
+            "fetch_s": round(self.fetch, 4),
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "error": self.error,
+        }
+
+
+class _CountingCursor:
+    """DBAPI cursor proxy that counts fetched rows/bytes and finishes the record on close."""
+
+    __slots__ = ("_cursor", "_record")
+
+    def __init__(self, cursor, record: QueryRecord):
+        self._cursor = cursor
+        self._record = record
+
+    def _timed(self, fetch, *args):
+        t0 = time.perf_counter()
+        rows = fetch(*args)
+        self._record.fetch += time.perf_counter() - t0
+        return rows
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is not None:
+            self._record.add_rows([row])
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._timed(self._cursor.fetchmany, *args)
+        self._record.add_rows(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        self._record.add_rows(rows)
+        return rows
+
+    def close(self):
+        try:
+            self._cursor.close()
+        finally:
+            _finish(self._record)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+# --------------------------------------------------------------------------- #
+# Aggregation
+# --------------------------------------------------------------------------- #
+_lock = threading.Lock()
+_durations: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=WINDOW))
+_totals: Dict[str, Dict[str, float]] = defaultdict(lambda: {"count": 0, "errors": 0, "rows": 0, "bytes": 0, "seconds": 0.0})
+_slow: Deque[Dict[str, Any]] = deque(maxlen=SLOW_LOG_SIZE)
+
+
+def _finish(record: QueryRecord) -> None:
+    if record._done:
+        return
+    record._done = True
+    total = record.total
+    with _lock:
+        _durations[record.key].append(total)
+        t = _totals[record.key]
+        t["count"] += 1
+        t["errors"] += record.error is not None
+        t["rows"] += record.rows
+        t["bytes"] += record.bytes
+        t["seconds"] += total
+    if total < SLOW_QUERY_SECONDS:
+        return
+
+    entry = record.to_dict()
+    with _lock:
+        _slow.append(entry)
+    logger.warning(
+        "[SLOW QUERY] %s %.2fs (%d rows) from %s",
+        record.key,
+        total,
+        record.rows,
+        record.caller,
+        extra={"query": entry},
+    )
+    if SLOW_QUERY_LOG:
+        try:
+            with _lock, open(SLOW_QUERY_LOG, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(entry) + "\n")
+        except OSError as exc:
+            logger.debug("Slow-query log not writable: %s", exc)
+
+
+def summary() -> List[Dict[str, Any]]:
+    """Per statement key: count, errors, rows/bytes and p50/p95/p99/max over the rolling window; slowest total first."""
+    with _lock:
+        snapshot = {k: (sorted(v), dict(_totals[k])) for k, v in _durations.items()}
+    out = []
+    for key, (values, t) in snapshot.items():
+        out.append(
+            {
+                "statement": key,
+                "count": int(t["count"]),
+                "errors": int(t["errors"]),
+                "total_s": round(t["seconds"], 3),
+                "p50_s": round(_quantile(values, 0.50), 4),
+                "p95_s": round(_quantile(values, 0.95), 4),
+                "p99_s": round(_quantile(values, 0.99), 4),
+                "max_s": round(values[-1], 4) if values else 0.0,
+                "rows": int(t["rows"]),
+                "avg_rows": round(t["rows"] / t["count"], 1) if t["count"] else 0.0,
+                "bytes": int(t["bytes"]),
+            }
+        )
+    return sorted(out, key=lambda r: r["total_s"], reverse=True)
+
+
+def slow_queries() -> List[Dict[str, Any]]:
+    with _lock:
+        return list(_slow)
+
+
+def export(path: str) -> str:
+    """Write summary, slow-query log and settings to `path` (JSON); returns the path."""
+    payload = {
+        "exported_at": datetime.now().isoformat(timespec="seconds"),
+        "slow_query_seconds": SLOW_QUERY_SECONDS,
+        "window": WINDOW,
+        "summary": summary(),
+        "slow_queries": slow_queries(),
+    }
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh, indent=2)
+    return path
+
+
+def _export_on_exit() -> None:
+    if _totals:
+        try:
+            export(EXPORT_ON_EXIT.replace("{pid}", str(os.getpid())))
+        except OSError as exc:
+            logger.warning("Query telemetry export failed: %s", exc)
+
+
+if EXPORT_ON_EXIT:
+    atexit.register(_export_on_exit)
+
+
+def reset() -> None:
+    with _lock:
+        _durations.clear()
+        _totals.clear()
+        _slow.clear()
+
+
+# --------------------------------------------------------------------------- #
+# Engine hooks
+# --------------------------------------------------------------------------- #
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._telemetry = QueryRecord(statement, parameters, executemany)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    record = getattr(context, "_telemetry", None)
+    if record is None:
+        return
+    record.duration = time.perf_counter() - record._t0
+    if cursor.description is None:
+        # No result set (DML / procedure without SELECT): nothing left to fetch
+        record.rows = max(cursor.rowcount, 0)
+        _finish(record)
+    else:
+        context.cursor = _CountingCursor(cursor, record)
+
+
+def _handle_error(exception_context):
+    context = exception_context.execution_context
+    record = getattr(context, "_telemetry", None)
+    if record is not None and not record._done:
+        record.duration = time.perf_counter() - record._t0
+        record.error = type(exception_context.original_exception).__name__
+        _finish(record)
+
+
+def install(engine: Engine) -> Engine:
+    """Attach the telemetry hooks to `engine` (idempotent); returns the engine."""
+    if TELEMETRY_ENABLED and not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+    return engine
+
+
+__all__ = [
+    "install",
+    "summary",
+    "slow_queries",
+    "export",
+    "reset",
+    "statement_key",
+    "redact",
+    "SLOW_QUERY_SECONDS",
+]
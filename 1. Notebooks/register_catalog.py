@@ -0,0 +1,308 @@
+"""
+register_catalog.py
+-------------------
+In-memory index of the register metadata (*TBL_Register* /
+*TBL_ConnectionPoint*).
+
+The catalog is bulk-loaded once per process and then refreshed incrementally
+on an ID watermark, so lookups such as EAN → registers → TypeIds → groups are
+plain dict hits instead of a database round-trip per widget click.
+
+Depends only on:
+• db_connection      (engine)
+• mappings           (TypeId → logical group)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+from sqlalchemy.engine import Engine
+
+from db_connection import get_engine
+from mappings import group_typeid_mapping
+
+logger = logging.getLogger(__name__)
+
+# Seconds between incremental refreshes (new IDs only); 0 refreshes on every lookup.
+REFRESH_INTERVAL = int(os.getenv("REGISTER_CATALOG_REFRESH", "300"))
+# Seconds between full reloads; they pick up changed and deleted rows, which the
+# ID-watermark refresh cannot see (TypeId changes, registers moved). 0 = never.
+RELOAD_INTERVAL = int(os.getenv("REGISTER_CATALOG_RELOAD", "3600"))
+# A lookup miss forces a refresh, but not more often than this (seconds).
+MISS_REFRESH_INTERVAL = 5
+
+SEARCH_METHODS = ("transferpoint", "objectid", "registerid", "registratorid", "connectionpoint")
+
+
+class RegisterCatalog:
+    """
+    Dict indexes over registers and connection points. Loading and lookups
+    share one lock, so a lookup never sees a half-loaded catalog.
+
+    `load()` reads both tables completely; `refresh()` only fetches rows with an
+    ID above the highest one seen. Changes to *existing* rows (e.g. a register
+    moved to another TypeId) and deletions are picked up by the next `load()`,
+    which lookups trigger every `reload_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        engine: Engine | None = None,
+        *,
+        refresh_interval: int = REFRESH_INTERVAL,
+        reload_interval: int = RELOAD_INTERVAL,
+    ):
+        self._engine = engine
+        self.refresh_interval = refresh_interval
+        self.reload_interval = reload_interval
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._last_load = 0.0
+        self._last_refresh = 0.0
+        self._last_miss_refresh = 0.0
+        self._reset()
+
+    # ------------------------------------------------------------------ #
+    # Loading
+    # ------------------------------------------------------------------ #
+    def _reset(self) -> None:
+        self._max_register_id = 0
+        self._max_cp_id = 0
+        self._cp_count = 0
+        # register → attributes
+        self._reg_typeid: Dict[int, int] = {}
+        self._reg_description: Dict[int, str] = {}
+        # relations
+        self._cp_registers: Dict[int, List[int]] = defaultdict(list)
+        self._registrator_registers: Dict[int, List[int]] = defaultdict(list)
+        self._ean_cps: Dict[str, List[int]] = defaultdict(list)
+        self._cp_object: Dict[int, int] = {}
+        self._object_cps: Dict[int, List[int]] = defaultdict(list)
+        self._transfer_children: Dict[int, List[int]] = defaultdict(list)
+        # TypeId → groups, rebuilt when mappings.group_typeid_mapping changes
+        self._typeid_groups: Dict[int, List[str]] = {}
+        self._groups_signature: tuple = ()
+
+    def load(self) -> None:
+        """(Re)load both tables completely."""
+        with self._lock:
+            self._reset()
+            self._fetch_since(0, 0)
+            self._loaded = True
+            self._last_load = time.monotonic()
+            logger.info(
+                "Register catalog loaded: %d registers, %d EANs",
+                len(self._reg_typeid),
+                len(self._ean_cps),
+            )
+
+    def refresh(self) -> None:
+        """Fetch only registers and connection points added since the last load/refresh."""
+        with self._lock:
+            if not self._loaded:
+                self.load()
+                return
+            self._fetch_since(self._max_register_id, self._max_cp_id)
+
+    def _fetch_since(self, register_id: int, cp_id: int) -> None:
+        engine = self._engine or get_engine()
+        with engine.connect() as conn:
+            cps = pd.read_sql_query(
+                """
+                SELECT ID, EAN_ConnectionPoint, TransferPointID, ObjectId
+                FROM dbo.TBL_ConnectionPoint
+                WHERE ID > ?
+                """,
+                conn,
+                params=(cp_id,),
+            )
+            regs = pd.read_sql_query(
+                """
+                SELECT ID, TypeId, Description, ConnectionPointId, RegistratorID
+                FROM dbo.TBL_Register
+                WHERE ID > ?
+                """,
+                conn,
+                params=(register_id,),
+            )
+
+        self._cp_count += len(cps)
+        for cid, ean, tp, obj in cps.itertuples(index=False):
+            cid = int(cid)
+            if pd.notna(ean):
+                self._ean_cps[str(ean)].append(cid)
+            if pd.notna(tp):
+                self._transfer_children[int(tp)].append(cid)
+            if pd.notna(obj):
+                self._cp_object[cid] = int(obj)
+                self._object_cps[int(obj)].append(cid)
+        for rid, tid, desc, cid, registrator in regs.itertuples(index=False):
+            rid = int(rid)
+            self._reg_typeid[rid] = int(tid)
+            self._reg_description[rid] = desc
+            if pd.notna(cid):
+                self._cp_registers[int(cid)].append(rid)
+            if pd.notna(registrator):
+                self._registrator_registers[int(registrator)].append(rid)
+
+        if not cps.empty:
+            self._max_cp_id = max(self._max_cp_id, int(cps["ID"].max()))
+        if not regs.empty:
+            self._max_register_id = max(self._max_register_id, int(regs["ID"].max()))
+        self._last_refresh = time.monotonic()
+        if register_id or cp_id:
+            logger.info("Register catalog refreshed: +%d registers, +%d connection points", len(regs), len(cps))
+
+    def _ensure_fresh(self) -> None:
+        if not self._loaded or (
+            self.reload_interval > 0 and time.monotonic() - self._last_load > self.reload_interval
+        ):
+            self.load()
+        elif time.monotonic() - self._last_refresh > self.refresh_interval:
+            self.refresh()
+
+    def _refresh_on_miss(self) -> bool:
+        """Refresh once when a lookup finds nothing (new EAN?); True if a refresh ran."""
+        now = time.monotonic()
+        if now - self._last_miss_refresh < MISS_REFRESH_INTERVAL:
+            return False
+        self._last_miss_refresh = now
+        self.refresh()
+        return True
+
+    # ------------------------------------------------------------------ #
+    # Lookups
+    # ------------------------------------------------------------------ #
+    def _connection_points(self, ean_value: str, search_method: str) -> List[int]:
+        own = self._ean_cps.get(ean_value, [])
+        if search_method == "connectionpoint":
+            return list(own)
+        if search_method == "transferpoint":
+            return list(own) + [child for cp in own for child in self._transfer_children.get(cp, [])]
+        if search_method == "objectid":
+            obj = next((self._cp_object[cp] for cp in own if cp in self._cp_object), None)
+            return list(self._object_cps.get(obj, [])) if obj is not None else []
+        raise ValueError(f"Unknown search_method '{search_method}'")
+
+    def _registers(self, ean_value: str, search_method: str) -> List[int]:
+        if search_method == "registerid":
+            rid = int(ean_value)
+            return [rid] if rid in self._reg_typeid else []
+        if search_method == "registratorid":
+            return list(self._registrator_registers.get(int(ean_value), []))
+        cps = dict.fromkeys(self._connection_points(ean_value, search_method))
+        return [rid for cp in cps for rid in self._cp_registers.get(cp, [])]
+
+    def registers_for_ean(self, ean_value: str, search_method: str = "transferpoint") -> List[int]:
+        """
+        Register IDs selected by `search_method`, with the same semantics as the
+        stored procedures. The extra method "connectionpoint" selects only the
+        connection points that carry the EAN itself.
+        """
+        if search_method not in SEARCH_METHODS:
+            raise ValueError(f"Unknown search_method '{search_method}'")
+        with self._lock:
+            self._ensure_fresh()
+            regs = self._registers(ean_value, search_method)
+            if not regs and self._refresh_on_miss():
+                regs = self._registers(ean_value, search_method)
+            return regs
+
+    def typeids_for_ean(self, ean_value: str, search_method: str = "transferpoint") -> Set[int]:
+        """Every TypeId linked to the EAN / ID, see `registers_for_ean`."""
+        with self._lock:
+            return {self._reg_typeid[r] for r in self.registers_for_ean(ean_value, search_method)}
+
+    def typeids_for_eans(self, ean_values: Iterable[str], search_method: str = "transferpoint") -> Dict[str, Set[int]]:
+        """
+        `typeids_for_ean` for a whole list; unknown EANs map to an empty set.
+        Misses trigger at most one refresh for the entire list.
+        """
+        if search_method not in SEARCH_METHODS:
+            raise ValueError(f"Unknown search_method '{search_method}'")
+        eans = list(dict.fromkeys(ean_values))
+        with self._lock:
+            self._ensure_fresh()
+            regs = {ean: self._registers(ean, search_method) for ean in eans}
+            misses = [ean for ean, r in regs.items() if not r]
+            if misses and self._refresh_on_miss():
+                regs.update({ean: self._registers(ean, search_method) for ean in misses})
+            return {ean: {self._reg_typeid[r] for r in r_list} for ean, r_list in regs.items()}
+
+    def typeid_for_register(self, register_id: int) -> Optional[int]:
+        with self._lock:
+            self._ensure_fresh()
+            return self._reg_typeid.get(int(register_id))
+
+    def register_info(self, register_ids: Iterable[int]) -> pd.DataFrame:
+        """`TypeId` and `Description` indexed by register ID (unknown IDs are left out)."""
+        reg_ids = sorted({int(r) for r in register_ids})
+        with self._lock:
+            self._ensure_fresh()
+            if any(r not in self._reg_typeid for r in reg_ids):
+                self._refresh_on_miss()
+            known = [r for r in reg_ids if r in self._reg_typeid]
+            return pd.DataFrame(
+                {
+                    "TypeId": [self._reg_typeid[r] for r in known],
+                    "Description": [self._reg_description[r] for r in known],
+                },
+                index=pd.Index(known, name="ID"),
+            )
+
+    def groups_for_typeid(self, typeid: int) -> List[str]:
+        """Logical groups (`mappings.group_typeid_mapping`) containing the TypeId."""
+        signature = tuple((g, tuple(t)) for g, t in group_typeid_mapping.items())
+        if signature != self._groups_signature:
+            index: Dict[int, List[str]] = defaultdict(list)
+            for grp, tids in group_typeid_mapping.items():
+                for tid in tids:
+                    index[tid].append(grp)
+            self._typeid_groups, self._groups_signature = dict(index), signature
+        return self._typeid_groups.get(int(typeid), [])
+
+    def groups_for_typeids(self, typeids: Iterable[int]) -> List[str]:
+        """Sorted distinct groups for a set of TypeIds."""
+        return sorted({grp for tid in typeids for grp in self.groups_for_typeid(tid)})
+
+    def groups_for_ean(self, ean_value: str, search_method: str = "transferpoint") -> List[str]:
+        return self.groups_for_typeids(self.typeids_for_ean(ean_value, search_method))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "registers": len(self._reg_typeid),
+            "connection_points": self._cp_count,
+            "eans": len(self._ean_cps),
+            "max_register_id": self._max_register_id,
+            "max_connection_point_id": self._max_cp_id,
+        }
+
+
+# --------------------------------------------------------------------------- #
+# Process-wide instance
+# --------------------------------------------------------------------------- #
+_catalog: Optional[RegisterCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> RegisterCatalog:
+    """Return the shared catalog (loaded lazily on first lookup)."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = RegisterCatalog()
+        return _catalog
+
+
+__all__ = [
+    "RegisterCatalog",
+    "get_catalog",
+    "SEARCH_METHODS",
+]
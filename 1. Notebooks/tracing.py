@@ -0,0 +1,333 @@
+"""
+tracing.py
+----------
+Lightweight tracing spans for the data pipeline: where did the time of a
+dataset build or export go?
+
+    with span("build_dataset", ean=ean) as root:
+        with span("fetch") as s:
+            df = fetch(...)
+            s.set_output(df)
+    print(render_html(root))
+
+Each span records wall time, rows/columns in and out, and the change in process
+memory (RSS; process-wide, so concurrent work is included). Finished spans are
+logged as structured records (`extra={"span": {...}}`) and nest through a
+context variable, so the helpers need no extra arguments. Worker threads do not
+inherit the context by themselves; wrap the callable with `bind()`.
+
+Depends only on the standard library (psutil is used when installed).
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import html
+import inspect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import psutil
+
+    _PROCESS = psutil.Process()
+except ImportError:
+    _PROCESS = None
+
+logger = logging.getLogger(__name__)
+
+# Tracing can be switched off entirely (spans then cost one ContextVar lookup)
+TRACING_ENABLED = os.getenv("TRACING", "1") != "0"
+# Spans shorter than this (seconds) are not logged; they still show up in the panel
+LOG_MIN_SECONDS = float(os.getenv("TRACING_LOG_MIN_SECONDS", "0"))
+# Notebooks show `render_html` under their output when set
+TIMING_PANEL = os.getenv("TIMING_PANEL", "0") == "1"
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None when it cannot be read cheaply."""
+    if _PROCESS is not None:
+        return _PROCESS.memory_info().rss
+    try:
+        with open("/proc/self/statm", "rb") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _shape(obj) -> tuple:
+    """(rows, columns) of a DataFrame/array-like; (None, None) otherwise."""
+    shape = getattr(obj, "shape", None)
+    if shape is None:
+        return None, None
+    return shape[0], (shape[1] if len(shape) > 1 else None)
+
+
+# --------------------------------------------------------------------------- #
+# Spans
+# --------------------------------------------------------------------------- #
+class Span:
+    """One timed stage; `children` holds the spans opened inside it."""
+
+    __slots__ = (
+        "name",
+        "attrs",
+        "parent",
+        "children",
+        "started_at",
+        "duration",
+        "rows_in",
+        "cols_in",
+        "rows_out",
+        "cols_out",
+        "mem_delta",
+        "error",
+        "_t0",
+        "_rss0",
+    )
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, **attrs: Any):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.children: List[Span] = []
+        self.started_at = time.time()
+        self.duration: Optional[float] = None
+        self.rows_in = self.cols_in = self.rows_out = self.cols_out = None
+        self.mem_delta: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def set_input(self, obj) -> "Span":
+        self.rows_in, self.cols_in = _shape(obj)
+        return self
+
+    def set_output(self, obj) -> "Span":
+        self.rows_out, self.cols_out = _shape(obj)
+        return self
+
+    def set(self, **attrs: Any) -> "Span":
+        self.attrs.update(attrs)
+        return self
+
+    @property
+    def path(self) -> str:
+        names, node = [], self
+        while node is not None:
+            names.append(node.name)
+            node = node.parent
+        return "/".join(reversed(names))
+
+    def walk(self, depth: int = 0) -> Iterator[tuple]:
+        """(depth, span) for this span and all descendants, depth-first."""
+        yield depth, self
+        for child in list(self.children):
+            yield from child.walk(depth + 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "path": self.path,
+            "started_at": self.started_at,
+            "duration_s": self.duration,
+            "rows_in": self.rows_in,
+            "cols_in": self.cols_in,
+            "rows_out": self.rows_out,
+            "cols_out": self.cols_out,
+            "mem_delta_mb": None if self.mem_delta is None else self.mem_delta / 1024**2,
+            "error": self.error,
+            **self.attrs,
+        }
+
+
+class _NoopSpan:
+    """Stand-in yielded when tracing is disabled."""
+
+    def set_input(self, obj):
+        return self
+
+    set_output = set_input
+
+    def set(self, **attrs):
+        return self
+
+
+_NOOP = _NoopSpan()
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("tracing_span", default=None)
+_last_root: Optional[Span] = None
+_children_lock = threading.Lock()
+
+
+@contextmanager
+def span(name: str, inputs=None, **attrs: Any) -> Iterator[Span]:
+    """
+    Time the enclosed block as a child of the current span (or as a new root).
+
+    `inputs` (a DataFrame) sets rows/columns in; call `set_output(df)` on the
+    yielded span for rows/columns out.
+    """
+    if not TRACING_ENABLED:
+        yield _NOOP
+        return
+
+    parent = _current.get()
+    s = Span(name, parent, **attrs)
+    if inputs is not None:
+        s.set_input(inputs)
+    token = _current.set(s)
+    s._rss0 = _rss_bytes()
+    s._t0 = time.perf_counter()
+    try:
+        yield s
+    except BaseException as exc:
+        s.error = type(exc).__name__
+        raise
+    finally:
+        s.duration = time.perf_counter() - s._t0
+        rss1 = _rss_bytes()
+        if rss1 is not None and s._rss0 is not None:
+            s.mem_delta = rss1 - s._rss0
+        _current.reset(token)
+        _finish(s)
+
+
+def _finish(s: Span) -> None:
+    global _last_root
+    if s.parent is not None:
+        with _children_lock:
+            s.parent.children.append(s)
+    else:
+        _last_root = s
+    if s.duration >= LOG_MIN_SECONDS:
+        logger.log(
+            logging.INFO if s.parent is None else logging.DEBUG,
+            "[TRACE] %s %.3fs rows %s→%s mem %s",
+            s.path,
+            s.duration,
+            s.rows_in,
+            s.rows_out,
+            "?" if s.mem_delta is None else f"{s.mem_delta / 1024**2:+.1f} MB",
+            extra={"span": s.to_dict()},
+        )
+
+
+def traced(name: Optional[str] = None, *, inputs: Optional[str] = None) -> Callable:
+    """
+    Decorator: run the function in a span named `name` (default: function name).
+    `inputs` names the DataFrame parameter for rows/columns in; the return value
+    gives rows/columns out.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        signature = inspect.signature(fn) if inputs else None
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            df_in = signature.bind_partial(*args, **kwargs).arguments.get(inputs) if signature else None
+            with span(name or fn.__name__, df_in) as s:
+                result = fn(*args, **kwargs)
+                s.set_output(result)
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def annotate(**attrs: Any) -> None:
+    """Add attributes to the current span (no-op outside a span)."""
+    s = _current.get()
+    if s is not None:
+        s.set(**attrs)
+
+
+def last_trace() -> Optional[Span]:
+    """The most recently finished root span (any thread)."""
+    return _last_root
+
+
+def bind(fn: Callable) -> Callable:
+    """
+    Wrap `fn` so it runs under the caller's current span, e.g. for
+    `ThreadPoolExecutor.submit(bind(fn), ...)`; each call gets its own context copy.
+    """
+    ctx = contextvars.copy_context()
+
+    def _bound(*args, **kwargs):
+        return ctx.copy().run(fn, *args, **kwargs)
+
+    return _bound
+
+
+# --------------------------------------------------------------------------- #
+# Timing panel
+# --------------------------------------------------------------------------- #
+def _fmt(value, fmt: str = "{:,}") -> str:
+    return "–" if value is None else fmt.format(value).replace(",", ".")
+
+
+def _in_out(a, b) -> str:
+    if a is None and b is None:
+        return ""
+    return f"{_fmt(a)} → {_fmt(b)}"
+
+
+def render_html(root: Optional[Span], *, title: str = "Timings") -> str:
+    """
+    HTML table of `root` and its descendants: time (with a bar relative to the
+    root), rows/columns in → out and memory delta. Empty string for no trace.
+    """
+    if getattr(root, "duration", None) is None:  # no trace, or tracing disabled
+        return ""
+    total = root.duration or 1e-9
+    rows = []
+    for depth, s in root.walk():
+        if s.duration is None:  # still running (worker outlived the root)
+            continue
+        pct = 100 * s.duration / total
+        mem = "" if s.mem_delta is None else f"{s.mem_delta / 1024**2:+.1f}"
+        label = html.escape(s.name) + (" ⚠" if s.error else "")
+        rows.append(
+            "<tr>"
+            f"<td style='padding-left:{6 + 14 * depth}px'>{label}</td>"
+            f"<td style='text-align:right'>{s.duration:.3f}</td>"
+            "<td style='width:120px'><div style='background:#4a90d9;height:8px;"
+            f"width:{min(pct, 100):.0f}%'></div></td>"
+            f"<td style='text-align:right'>{_in_out(s.rows_in, s.rows_out)}</td>"
+            f"<td style='text-align:right'>{_in_out(s.cols_in, s.cols_out)}</td>"
+            f"<td style='text-align:right'>{mem}</td>"
+            "</tr>"
+        )
+    return (
+        "<details style='font-family: Roboto, sans-serif; font-size:12px; margin-top:6px;'>"
+        f"<summary>{html.escape(title)}: {root.duration:.2f} s</summary>"
+        "<table style='border-collapse:collapse'>"
+        "<tr><th style='text-align:left'>Stap</th><th>Tijd (s)</th><th></th>"
+        "<th>Rijen in → uit</th><th>Kolommen in → uit</th><th>Geheugen Δ (MB)</th></tr>"
+        + "".join(rows)
+        + "</table></details>"
+    )
+
+
+__all__ = [
+    "Span",
+    "span",
+    "traced",
+    "bind",
+    "annotate",
+    "current_span",
+    "last_trace",
+    "render_html",
+    "TRACING_ENABLED",
+    "TIMING_PANEL",
+]
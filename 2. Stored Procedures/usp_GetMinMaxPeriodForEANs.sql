@@ -0,0 +1,136 @@
+CREATE OR ALTER PROCEDURE [dbo].[usp_GetMinMaxPeriodForEANs]
+(
+    @EANList             VARCHAR(MAX),
+    @AllowedTypeIDs      VARCHAR(MAX),
+    @StartDateStr        VARCHAR(50),
+    @EndDateStr          VARCHAR(50),
+    @SearchMethod        VARCHAR(20) = 'transferpoint'
+)
+AS
+BEGIN
+    -- Set-based variant van usp_GetMinMaxPeriodForEAN: één resultaatset met
+    -- (EAN, MinUTCPeriod, MaxUTCPeriod) per opgegeven EAN/ID. Onbekende waarden
+    -- of waarden zonder data krijgen NULL i.p.v. een THROW.
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @ErrMsg        NVARCHAR(4000);
+    DECLARE @StartDateTime DATETIME;
+    DECLARE @EndDateTime   DATETIME;
+
+    -- 1. Datums parsen (dd/mm/yyyy HH:MM verwacht)
+    BEGIN TRY
+        SET @StartDateTime = CONVERT(DATETIME, @StartDateStr, 103);
+        SET @EndDateTime   = CONVERT(DATETIME, @EndDateStr, 103);
+    END TRY
+    BEGIN CATCH
+        SET @ErrMsg = N'Ongeldig datumformaat. Verwacht: dd/mm/yyyy HH:MM - Input: '
+                      + @StartDateStr + N', ' + @EndDateStr;
+        THROW 50000, @ErrMsg, 1;
+    END CATCH;
+
+    -- 2. Zet AllowedTypeIDs en EANList in temp-tables
+    IF OBJECT_ID('tempdb..#AllowedTypes') IS NOT NULL
+        DROP TABLE #AllowedTypes;
+    IF OBJECT_ID('tempdb..#EANs') IS NOT NULL
+        DROP TABLE #EANs;
+    IF OBJECT_ID('tempdb..#Registers') IS NOT NULL
+        DROP TABLE #Registers;
+
+    CREATE TABLE #AllowedTypes (TypeID BIGINT NOT NULL);
+
+    INSERT INTO #AllowedTypes (TypeID)
+    SELECT TRY_CAST([value] AS BIGINT)
+    FROM STRING_SPLIT(@AllowedTypeIDs, ',')
+    WHERE TRY_CAST([value] AS BIGINT) IS NOT NULL;
+
+    -- Extra controle: indien geen geldige TypeIDs
+    IF NOT EXISTS (SELECT 1 FROM #AllowedTypes)
+    BEGIN
+        SET @ErrMsg = 'Geen geldige TypeIDs opgegeven: ' + @AllowedTypeIDs;
+        THROW 50000, @ErrMsg, 1;
+    END;
+
+    CREATE TABLE #EANs (EAN VARCHAR(255) NOT NULL PRIMARY KEY);
+
+    INSERT INTO #EANs (EAN)
+    SELECT DISTINCT LTRIM(RTRIM([value]))
+    FROM STRING_SPLIT(@EANList, ',')
+    WHERE LTRIM(RTRIM([value])) <> '';
+
+    -- 3. Registers per EAN, afhankelijk van @SearchMethod
+    CREATE TABLE #Registers
+    (
+        EAN        VARCHAR(255) NOT NULL,
+        RegisterID BIGINT       NOT NULL
+    );
+
+    IF @SearchMethod = 'registerid'
+    BEGIN
+        INSERT INTO #Registers (EAN, RegisterID)
+        SELECT e.EAN, r.ID
+        FROM #EANs e
+        INNER JOIN dbo.TBL_Register r ON r.ID = TRY_CAST(e.EAN AS BIGINT)
+        WHERE r.TypeId IN (SELECT TypeID FROM #AllowedTypes);
+    END
+    ELSE IF @SearchMethod = 'registratorid'
+    BEGIN
+        INSERT INTO #Registers (EAN, RegisterID)
+        SELECT e.EAN, r.ID
+        FROM #EANs e
+        INNER JOIN dbo.TBL_Register r ON r.RegistratorID = TRY_CAST(e.EAN AS BIGINT)
+        WHERE r.TypeId IN (SELECT TypeID FROM #AllowedTypes);
+    END
+    ELSE IF @SearchMethod = 'objectid'
+    BEGIN
+        INSERT INTO #Registers (EAN, RegisterID)
+        SELECT e.EAN, r.ID
+        FROM #EANs e
+        CROSS APPLY
+        (
+            SELECT TOP 1 cp.ObjectId
+            FROM dbo.TBL_ConnectionPoint cp
+            WHERE cp.EAN_ConnectionPoint = e.EAN
+        ) o
+        INNER JOIN dbo.TBL_ConnectionPoint cp ON cp.ObjectId = o.ObjectId
+        INNER JOIN dbo.TBL_Register r ON r.ConnectionPointId = cp.ID
+        WHERE r.TypeId IN (SELECT TypeID FROM #AllowedTypes);
+    END
+    ELSE
+    BEGIN
+        -- Default: 'transferpoint'
+        INSERT INTO #Registers (EAN, RegisterID)
+        SELECT DISTINCT e.EAN, r.ID
+        FROM #EANs e
+        CROSS APPLY
+        (
+            SELECT TOP 1 cp.ID
+            FROM dbo.TBL_ConnectionPoint cp
+            WHERE cp.EAN_ConnectionPoint = e.EAN
+        ) s
+        INNER JOIN dbo.TBL_ConnectionPoint cp ON (cp.ID = s.ID OR cp.TransferPointID = s.ID)
+        INNER JOIN dbo.TBL_Register r ON r.ConnectionPointId = cp.ID
+        WHERE r.TypeId IN (SELECT TypeID FROM #AllowedTypes);
+    END;
+
+    -- 4. Min/max per EAN in één resultaatset
+    SELECT
+        e.EAN,
+        MIN(d.utcperiod) AS MinUTCPeriod,
+        MAX(d.utcperiod) AS MaxUTCPeriod
+    FROM #EANs e
+    LEFT JOIN #Registers rg ON rg.EAN = e.EAN
+    LEFT JOIN dbo.TBL_Data d
+           ON d.RegisterID = rg.RegisterID
+          AND d.utcperiod BETWEEN @StartDateTime AND @EndDateTime
+    GROUP BY e.EAN;
+
+    IF OBJECT_ID('tempdb..#Registers') IS NOT NULL
+        DROP TABLE #Registers;
+    IF OBJECT_ID('tempdb..#EANs') IS NOT NULL
+        DROP TABLE #EANs;
+    IF OBJECT_ID('tempdb..#AllowedTypes') IS NOT NULL
+        DROP TABLE #AllowedTypes;
+END;
+GO
+
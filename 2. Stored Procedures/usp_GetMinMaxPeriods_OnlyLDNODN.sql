@@ -0,0 +1,41 @@
+SET ANSI_NULLS ON
+GO
+SET QUOTED_IDENTIFIER ON
+GO
+CREATE   PROCEDURE [dbo].[usp_GetMinMaxPeriods_OnlyLDNODN]
+(
+    @EANList VARCHAR(MAX),
+    @StartDate DATETIME,
+    @EndDate DATETIME
+)
+AS
+BEGIN
+    -- Set-based variant van usp_GetMinMaxPeriod_OnlyLDNODN: één rij
+    -- (EAN, MinPeriod, MaxPeriod) per EAN uit de komma-gescheiden lijst;
+    -- NULL voor onbekende EANs of EANs zonder data.
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @EANs TABLE (EAN VARCHAR(255) NOT NULL PRIMARY KEY);
+
+    INSERT INTO @EANs (EAN)
+    SELECT DISTINCT LTRIM(RTRIM([value]))
+    FROM STRING_SPLIT(@EANList, ',')
+    WHERE LTRIM(RTRIM([value])) <> '';
+
+    SELECT
+        e.[EAN],
+        MIN(d.[utcperiod]) AS MinPeriod,
+        MAX(d.[utcperiod]) AS MaxPeriod
+    FROM @EANs e
+    LEFT JOIN dbo.TBL_ConnectionPoint cp ON cp.[EAN_ConnectionPoint] = e.[EAN]
+    LEFT JOIN dbo.TBL_Register r
+           ON r.[ConnectionPointId] = cp.[ID]
+          AND r.[TypeId] IN (1000,1007,1050,1051,1075,1076,1088,1094,
+                             1001,1005,1077,1078,1089)
+    LEFT JOIN dbo.TBL_Data d
+           ON d.[registerid] = r.[ID]
+          AND d.[utcperiod] BETWEEN @StartDate AND @EndDate
+    GROUP BY e.[EAN];
+END;
+GO
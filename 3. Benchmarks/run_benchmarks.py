@@ -0,0 +1,418 @@
+"""
+run_benchmarks.py
+-----------------
+End-to-end benchmarks of the data pipeline against the SQLite stand-in
+(`sql_standin`) filled with synthetic meter data (`synthetic_data`).
+
+    python run_benchmarks.py                                  # small + medium
+    python run_benchmarks.py --scales large --repeat 5
+    python run_benchmarks.py --eans 200 --registers 2 --days 31 --interval 5
+    python run_benchmarks.py --json current.json --compare baseline.json
+
+Per scenario the median and minimum wall time over `--repeat` runs are
+reported, plus the tracemalloc peak of one extra run (timed runs are not
+traced, tracing slows allocation-heavy code down). Cold scenarios empty all
+caches before every run. With `--compare` the exit code is 1 when a scenario
+got slower than the baseline by more than `--threshold`.
+
+Needs the app environment (environment.yml): frequency_utils imports
+common_imports.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+NOTEBOOKS_DIR = os.path.abspath(os.path.join(HERE, os.pardir, "1. Notebooks"))
+sys.path.insert(0, NOTEBOOKS_DIR)
+
+# Keep the user's Parquet cache out of the measurements; must be set before db_utils is imported
+os.environ.setdefault("DISK_CACHE_MAX_MB", "0")
+os.environ.setdefault("DISK_CACHE_DIR", os.path.join(tempfile.gettempdir(), "energieapp_benchmarks", "disk_cache"))
+
+from sql_standin import DEFAULT_DATA_DIR, create_standin, install  # noqa: E402
+from synthetic_data import REGISTER_TYPES, SyntheticSpec, ean_code  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+SCALES: Dict[str, SyntheticSpec] = {
+    "small": SyntheticSpec(n_eans=5, registers_per_ean=4, interval_minutes=15, days=31),
+    "medium": SyntheticSpec(n_eans=20, registers_per_ean=4, interval_minutes=15, days=180),
+    "large": SyntheticSpec(n_eans=50, registers_per_ean=4, interval_minutes=15, days=365),
+}
+
+# 003 notebook cells with the pipeline functions (0 and 5 are UI)
+VMNED_NOTEBOOK = os.path.join(NOTEBOOKS_DIR, "003_VMNED_Data_Export.ipynb")
+VMNED_CELLS = (1, 2, 3, 4)
+
+# Regressions below this many seconds are treated as noise
+MIN_REGRESSION_SECONDS = 0.05
+
+
+# --------------------------------------------------------------------------- #
+# Setup
+# --------------------------------------------------------------------------- #
+def _load_app(engine) -> SimpleNamespace:
+    """Import the app modules (after `install`, so they bind the stand-in)."""
+    install(engine)
+    import dataset_utils
+    import db_utils
+    import mappings
+    import register_catalog
+
+    return SimpleNamespace(
+        dataset_utils=dataset_utils,
+        db_utils=db_utils,
+        mappings=mappings,
+        register_catalog=register_catalog,
+    )
+
+
+def load_notebook_functions(path: str, cells, namespace: Dict[str, Any]) -> Dict[str, Any]:
+    """Execute the given code cells of a notebook in `namespace` (for its pipeline functions)."""
+    with open(path, encoding="utf-8") as fh:
+        nb = json.load(fh)
+    for i in cells:
+        source = "".join(nb["cells"][i]["source"])
+        exec(compile(source, f"{os.path.basename(path)}[{i}]", "exec"), namespace)
+    return namespace
+
+
+def _vmned_namespace(engine) -> Dict[str, Any]:
+    namespace: Dict[str, Any] = {"__name__": "vmned_benchmark"}
+    exec("from common_imports import *", namespace)
+    namespace["engine"] = engine
+    return load_notebook_functions(VMNED_NOTEBOOK, VMNED_CELLS, namespace)
+
+
+class Context(NamedTuple):
+    spec: SyntheticSpec
+    engine: Any
+    app: SimpleNamespace
+    vmned: Dict[str, Any]
+    eans: List[str]
+    groups: List[str]
+    tmpdir: str
+
+    @property
+    def start(self):
+        return self.spec.start
+
+    @property
+    def end(self):
+        return self.spec.end
+
+    @property
+    def freq(self) -> str:
+        return "5T" if self.spec.interval_minutes == 5 else "15T"
+
+    @property
+    def typeids_str(self) -> str:
+        used = {tid for tid, _ in REGISTER_TYPES[: self.spec.registers_per_ean]}
+        return ",".join(map(str, sorted(used)))
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.tmpdir, name)
+
+
+def reset_caches(ctx: Context) -> None:
+    ctx.app.db_utils.clear_caches()
+    ctx.vmned["min_max_cache"].clear()
+    ctx.vmned["full_data_cache"].clear()
+
+
+# --------------------------------------------------------------------------- #
+# Scenarios
+# --------------------------------------------------------------------------- #
+class Scenario(NamedTuple):
+    name: str
+    run: Callable[[Context, Any], int]  # returns the number of rows produced
+    setup: Optional[Callable[[Context], Any]] = None
+    cold: bool = True
+
+
+def _rows(df) -> int:
+    return 0 if df is None else len(df)
+
+
+def _build(ctx: Context, *, long_format: bool = True, aggregate: bool = False):
+    return ctx.app.dataset_utils.build_dataset(
+        ctx.eans[0],
+        ctx.groups,
+        ctx.start,
+        ctx.end,
+        ctx.freq,
+        aggregate,
+        include_status_raw=True,
+        long_format=long_format,
+        engine=ctx.engine,
+    )
+
+
+def _min_max_per_ean(ctx: Context, _state) -> int:
+    for ean in ctx.eans:
+        ctx.app.db_utils.fetch_min_max_period(ean, ctx.typeids_str, ctx.start, ctx.end, engine=ctx.engine)
+    return len(ctx.eans)
+
+
+def _min_max_batched(ctx: Context, _state) -> int:
+    return len(ctx.app.db_utils.fetch_min_max_periods(ctx.eans, ctx.typeids_str, ctx.start, ctx.end, engine=ctx.engine))
+
+
+def _typeids_batched(ctx: Context, _state) -> int:
+    return len(ctx.app.db_utils.fetch_typeids_for_eans(ctx.eans, engine=ctx.engine))
+
+
+def _fetch_wide(ctx: Context):
+    return ctx.app.db_utils.fetch_full_data(
+        ctx.eans[0],
+        ctx.typeids_str,
+        ctx.start,
+        ctx.end,
+        interval_minutes=ctx.spec.interval_minutes,
+        include_status=True,
+        engine=ctx.engine,
+    )
+
+
+def _group_columns(ctx: Context, df) -> int:
+    return _rows(ctx.app.dataset_utils.group_columns_by_typeid(df, include_status=True, engine=ctx.engine))
+
+
+def _export_csv(ctx: Context, df) -> int:
+    ctx.app.dataset_utils.export_dataset_to_csv(df, ctx.path("dataset.csv"))
+    return _rows(df)
+
+
+def _export_excel(ctx: Context, df) -> int:
+    ctx.app.dataset_utils.export_dataset_to_excel(df, ctx.path("dataset.xlsx"), excel_format=True, include_status=True)
+    return _rows(df)
+
+
+def _stream_csv(ctx: Context, _state) -> int:
+    ctx.app.dataset_utils.stream_dataset_to_csv(
+        ctx.eans[0],
+        ctx.groups,
+        ctx.start,
+        ctx.end,
+        ctx.freq,
+        False,
+        ctx.path("streamed.csv"),
+        include_status_raw=True,
+        engine=ctx.engine,
+    )
+    with open(ctx.path("streamed.csv"), encoding="utf-8") as fh:
+        return sum(1 for _ in fh) - 1
+
+
+def _vmned_freq(ctx: Context) -> str:
+    return "5min" if ctx.spec.interval_minutes == 5 else "15min"
+
+
+def _vmned_build(ctx: Context, _state) -> int:
+    return _rows(ctx.vmned["build_multiean_data"](ctx.eans, ctx.start, ctx.end, _vmned_freq(ctx)))
+
+
+def _vmned_export(ctx: Context, df) -> int:
+    ctx.vmned["export_dataset_to_csv"](df, ctx.path("vmned.csv"))
+    return _rows(df)
+
+
+def _has_xlsxwriter() -> bool:
+    try:
+        import xlsxwriter  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def scenarios() -> List[Scenario]:
+    result = [
+        Scenario("min/max per EAN", _min_max_per_ean),
+        Scenario("min/max batched", _min_max_batched),
+        Scenario("typeids batched", _typeids_batched),
+        Scenario("build_dataset long", lambda ctx, _: _rows(_build(ctx))),
+        Scenario("build_dataset wide", lambda ctx, _: _rows(_build(ctx, long_format=False))),
+        Scenario("build_dataset aggregate", lambda ctx, _: _rows(_build(ctx, aggregate=True))),
+        Scenario("build_dataset warm", lambda ctx, _: _rows(_build(ctx)), setup=_build, cold=False),
+        Scenario("group_columns_by_typeid", _group_columns, setup=_fetch_wide),
+        Scenario("export csv", _export_csv, setup=_build),
+        Scenario("stream csv", _stream_csv),
+        Scenario("003 build_multiean_data", _vmned_build),
+        Scenario(
+            "003 export csv",
+            _vmned_export,
+            setup=lambda ctx: ctx.vmned["build_multiean_data"](ctx.eans, ctx.start, ctx.end, _vmned_freq(ctx)),
+        ),
+    ]
+    if _has_xlsxwriter():
+        result.append(Scenario("export excel", _export_excel, setup=_build))
+    return result
+
+
+# --------------------------------------------------------------------------- #
+# Measurement
+# --------------------------------------------------------------------------- #
+def measure(ctx: Context, scenario: Scenario, repeat: int) -> Dict[str, Any]:
+    def _prepare():
+        if scenario.cold:
+            reset_caches(ctx)
+        return scenario.setup(ctx) if scenario.setup else None
+
+    timings, rows = [], 0
+    for _ in range(repeat):
+        state = _prepare()
+        started = time.perf_counter()
+        rows = scenario.run(ctx, state)
+        timings.append(time.perf_counter() - started)
+
+    state = _prepare()
+    tracemalloc.start()
+    try:
+        scenario.run(ctx, state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "peak_mb": peak / 1024**2,
+        "rows": rows,
+    }
+
+
+def run_scale(
+    name: str,
+    spec: SyntheticSpec,
+    *,
+    repeat: int,
+    data_dir: str,
+    rebuild: bool = False,
+    only: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    engine = create_standin(spec, data_dir=data_dir, rebuild=rebuild)
+    logger.info("Scale %s: stand-in ready in %.1fs (%d data rows)", name, time.perf_counter() - started, spec.data_rows)
+
+    app = _load_app(engine)
+    # The app loads the catalog once per kernel; keep that out of the timings
+    app.register_catalog.get_catalog().load()
+    registered = {tid for tid, _ in REGISTER_TYPES[: spec.registers_per_ean]}
+    groups = [g for g, tids in app.mappings.group_typeid_mapping.items() if registered & set(tids)]
+
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ctx = Context(
+            spec=spec,
+            engine=engine,
+            app=app,
+            vmned=_vmned_namespace(engine),
+            eans=[ean_code(i) for i in range(1, spec.n_eans + 1)],
+            groups=groups,
+            tmpdir=tmpdir,
+        )
+        for scenario in scenarios():
+            if only and not any(o.lower() in scenario.name.lower() for o in only):
+                continue
+            results[scenario.name] = measure(ctx, scenario, repeat)
+            r = results[scenario.name]
+            print(
+                f"{name:<8} {scenario.name:<26} {r['median_s']:>9.3f} {r['min_s']:>9.3f} "
+                f"{r['peak_mb']:>10.1f} {r['rows']:>10}",
+                flush=True,
+            )
+    engine.dispose()
+    return {"spec": {k: str(v) for k, v in spec._asdict().items()}, "data_rows": spec.data_rows, "results": results}
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Scenarios whose median got slower than `baseline` by more than `threshold` (fraction)."""
+    regressions = []
+    for scale, data in current.items():
+        base = baseline.get(scale, {}).get("results", {})
+        for name, r in data["results"].items():
+            b = base.get(name)
+            if b is None:
+                continue
+            slower = r["median_s"] - b["median_s"]
+            if slower > MIN_REGRESSION_SECONDS and r["median_s"] > b["median_s"] * (1 + threshold):
+                regressions.append(f"{scale} / {name}: {b['median_s']:.3f}s -> {r['median_s']:.3f}s")
+    return regressions
+
+
+# --------------------------------------------------------------------------- #
+# CLI
+# --------------------------------------------------------------------------- #
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__.split("\n\n")[0], formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--scales", nargs="+", choices=sorted(SCALES), default=["small", "medium"])
+    p.add_argument("--eans", type=int, help="custom scale: number of EANs (replaces --scales)")
+    p.add_argument("--registers", type=int, default=4, help="custom scale: registers per EAN")
+    p.add_argument("--interval", type=int, choices=(5, 15), default=15, help="custom scale: minutes per reading")
+    p.add_argument("--days", type=int, default=31, help="custom scale: days of data")
+    p.add_argument("--status-density", type=float, default=0.01, help="custom scale: fraction of rows with a status")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--only", nargs="+", help="run only scenarios whose name contains one of these")
+    p.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="where stand-in databases are kept between runs")
+    p.add_argument("--rebuild", action="store_true", help="regenerate the stand-in databases")
+    p.add_argument("--json", help="write the results to this file")
+    p.add_argument("--compare", help="baseline JSON from an earlier --json run")
+    p.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs. baseline (0.25 = 25%%)")
+    p.add_argument("-v", "--verbose", action="store_true")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    if not args.verbose:
+        # pandas deprecation noise (FREQS still uses "15T" etc.) would drown the table
+        warnings.simplefilter("ignore", FutureWarning)
+
+    if args.eans:
+        specs = {
+            "custom": SyntheticSpec(
+                n_eans=args.eans,
+                registers_per_ean=args.registers,
+                interval_minutes=args.interval,
+                days=args.days,
+                status_density=args.status_density,
+            )
+        }
+    else:
+        specs = {name: SCALES[name] for name in args.scales}
+
+    print(f"{'scale':<8} {'scenario':<26} {'median s':>9} {'min s':>9} {'peak MB':>10} {'rows':>10}")
+    current = {
+        name: run_scale(name, spec, repeat=args.repeat, data_dir=args.data_dir, rebuild=args.rebuild, only=args.only)
+        for name, spec in specs.items()
+    }
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(current, fh, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            regressions = compare(current, json.load(fh), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
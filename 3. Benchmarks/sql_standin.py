@@ -0,0 +1,475 @@
+"""
+sql_standin.py
+--------------
+Local SQLite stand-in for the EDS2 SQL Server, filled with `synthetic_data`.
+
+The app code runs unchanged against it:
+
+• the tables live in one SQLite file that is attached as schema `dbo`, so both
+  `dbo.TBL_Data` and plain `TBL_Data` resolve
+• a `before_cursor_execute` hook rewrites `EXEC dbo.usp_...` into SQLite queries
+  with the **same result shapes** (column names, interval rounding, pivot
+  column names, NULL rows) and raises the same "no data" errors as the stored
+  procedures in "2. Stored Procedures/"
+
+Timings are not SQL Server timings; the stand-in exists to compare the Python
+side across versions and scales.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+from synthetic_data import SyntheticSpec, generate_connection_points, generate_registers, iter_data
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), "energieapp_benchmarks")
+
+# Same input format as the stored procedures (CONVERT(..., 103))
+SP_DATETIME_FORMAT = "%d/%m/%Y %H:%M"
+# TypeIds hard-coded in the *_OnlyLDNODN procedures
+ONLY_LDN_ODN_TYPEIDS = (1000, 1007, 1050, 1051, 1075, 1076, 1088, 1094, 1001, 1005, 1077, 1078, 1089)
+
+_SCHEMA = """
+CREATE TABLE TBL_ConnectionPoint (
+    ID                  INTEGER PRIMARY KEY,
+    EAN_ConnectionPoint TEXT,
+    TransferPointID     INTEGER,
+    ObjectId            INTEGER
+);
+CREATE INDEX ix_cp_ean ON TBL_ConnectionPoint (EAN_ConnectionPoint);
+CREATE TABLE TBL_Register (
+    ID                INTEGER PRIMARY KEY,
+    TypeId            INTEGER,
+    Description       TEXT,
+    ConnectionPointId INTEGER,
+    RegistratorID     INTEGER
+);
+CREATE INDEX ix_register_cp ON TBL_Register (ConnectionPointId);
+CREATE TABLE TBL_Data (
+    utcperiod   TEXT,
+    registerid  INTEGER,
+    consumption REAL,
+    statusid    TEXT
+);
+"""
+# Created after the bulk insert (much faster than maintaining it row by row)
+_DATA_INDEX = "CREATE INDEX ix_data_register_period ON TBL_Data (registerid, utcperiod)"
+
+
+# --------------------------------------------------------------------------- #
+# Database file
+# --------------------------------------------------------------------------- #
+def database_path(spec: SyntheticSpec, data_dir: str = DEFAULT_DATA_DIR) -> str:
+    """File for `spec`; identical specs share (and reuse) one database."""
+    digest = hashlib.sha1(repr(tuple(spec)).encode()).hexdigest()[:12]
+    return os.path.join(data_dir, f"standin_{digest}.sqlite")
+
+
+def _format_periods(values: np.ndarray) -> List[str]:
+    # 'YYYY-MM-DD HH:MM:SS' sorts and compares like DATETIME
+    return np.char.replace(np.datetime_as_string(values, unit="s"), "T", " ").tolist()
+
+
+def build_database(spec: SyntheticSpec, path: str) -> None:
+    """Generate `spec` into a new SQLite file at `path` (replaced atomically)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript(_SCHEMA)
+        cps = generate_connection_points(spec)
+        conn.executemany(
+            "INSERT INTO TBL_ConnectionPoint VALUES (?, ?, ?, ?)",
+            [
+                (int(i), ean, None if tp is None else int(tp), int(obj))
+                for i, ean, tp, obj in cps.astype(object).itertuples(index=False)
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO TBL_Register VALUES (?, ?, ?, ?, ?)",
+            [tuple(r) for r in generate_registers(spec).astype(object).itertuples(index=False)],
+        )
+        for chunk in iter_data(spec):
+            conn.executemany(
+                "INSERT INTO TBL_Data VALUES (?, ?, ?, ?)",
+                zip(
+                    _format_periods(chunk["utcperiod"].to_numpy()),
+                    chunk["registerid"].tolist(),
+                    chunk["consumption"].tolist(),
+                    chunk["statusid"].tolist(),
+                ),
+            )
+        conn.execute(_DATA_INDEX)
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+    logger.info("Stand-in database built: %s (%d data rows)", path, spec.data_rows)
+
+
+# --------------------------------------------------------------------------- #
+# Stored-procedure emulation
+# --------------------------------------------------------------------------- #
+class ProcedureError(sqlite3.OperationalError):
+    """THROW/RAISERROR of an emulated procedure (message identical to the SP)."""
+
+
+def _sp_datetime(value: Any) -> str:
+    if isinstance(value, str):
+        value = datetime.strptime(value, SP_DATETIME_FORMAT)
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _typeids(csv: str) -> List[int]:
+    ids = [int(v) for v in str(csv).split(",") if v.strip().lstrip("-").isdigit()]
+    if not ids:
+        raise ProcedureError(f"Geen geldige TypeIDs opgegeven: {csv}")
+    return ids
+
+
+def _in_list(values: Sequence[int]) -> str:
+    # Integers only, so inlining is safe; IN (NULL) matches nothing
+    return ", ".join(str(int(v)) for v in values) or "NULL"
+
+
+def _bucket_sql(interval_minutes: int) -> str:
+    """SQLite equivalent of the AggregatedUTCPeriod CASE in the SPs (ceiling per minute-of-hour)."""
+    iv = int(interval_minutes)
+    if iv == -1:
+        return "utcperiod"
+    if iv == 43200:
+        return "strftime('%Y-%m-01 00:00:00', utcperiod)"
+    return (
+        f"datetime(utcperiod, '+' || (({iv} - CAST(strftime('%M', utcperiod) AS INTEGER) % {iv}) % {iv})"
+        " || ' minutes')"
+    )
+
+
+def _registers(
+    db: sqlite3.Connection,
+    ean: str,
+    search_method: str,
+    typeids: Iterable[int],
+    *,
+    strict: bool = True,
+) -> List[int]:
+    """Register IDs as selected by usp_GetMinMaxPeriodForEAN / usp_GetConnectionData*."""
+    types = _in_list(list(typeids))
+
+    def _ids(sql: str, params: tuple) -> List[int]:
+        return [r[0] for r in db.execute(sql, params)]
+
+    if search_method in ("registerid", "registratorid"):
+        number = int(ean) if str(ean).strip().isdigit() else None
+        if number is None:
+            if strict:
+                label = "registerID" if search_method == "registerid" else "registratorID"
+                raise ProcedureError(f"Geen geldig {label} opgegeven ({ean})")
+            return []
+        column = "ID" if search_method == "registerid" else "RegistratorID"
+        return _ids(f"SELECT ID FROM TBL_Register WHERE {column} = ? AND TypeId IN ({types})", (number,))
+
+    column = "ObjectId" if search_method == "objectid" else "ID"
+    row = db.execute(
+        f"SELECT {column} FROM TBL_ConnectionPoint WHERE EAN_ConnectionPoint = ? ORDER BY ID LIMIT 1", (ean,)
+    ).fetchone()
+    if row is None or row[0] is None:
+        if strict:
+            raise ProcedureError(f"Geen ConnectionPoint gevonden voor EAN={ean}")
+        return []
+    if search_method == "objectid":
+        where = "cp.ObjectId = ?"
+        params: tuple = (row[0],)
+    else:  # 'transferpoint'
+        where = "(cp.ID = ? OR cp.TransferPointID = ?)"
+        params = (row[0], row[0])
+    return _ids(
+        f"""
+        SELECT r.ID FROM TBL_Register r
+        JOIN TBL_ConnectionPoint cp ON cp.ID = r.ConnectionPointId
+        WHERE {where} AND r.TypeId IN ({types})
+        """,
+        params,
+    )
+
+
+def _ean_registers(db: sqlite3.Connection, ean: str, typeids: Iterable[int]) -> List[int]:
+    """Registers of the connection points carrying `ean` itself (the *_OnlyLDNODN selection)."""
+    return [
+        r[0]
+        for r in db.execute(
+            f"""
+            SELECT r.ID FROM TBL_Register r
+            JOIN TBL_ConnectionPoint cp ON cp.ID = r.ConnectionPointId
+            WHERE cp.EAN_ConnectionPoint = ? AND r.TypeId IN ({_in_list(list(typeids))})
+            """,
+            (ean,),
+        )
+    ]
+
+
+def _ean_exists(db: sqlite3.Connection, ean: str) -> bool:
+    return db.execute("SELECT 1 FROM TBL_ConnectionPoint WHERE EAN_ConnectionPoint = ?", (ean,)).fetchone() is not None
+
+
+def _has_data(db: sqlite3.Connection, register_ids: List[int], start: str, end: str) -> bool:
+    return (
+        db.execute(
+            f"SELECT 1 FROM TBL_Data WHERE registerid IN ({_in_list(register_ids)}) "
+            "AND utcperiod BETWEEN ? AND ? LIMIT 1",
+            (start, end),
+        ).fetchone()
+        is not None
+    )
+
+
+def _fill_ean_registers(db: sqlite3.Connection, pairs: List[Tuple[str, Optional[int]]]) -> None:
+    """#temp-table stand-in: (EAN, RegisterID) rows for the batched procedures."""
+    db.execute("CREATE TEMP TABLE IF NOT EXISTS standin_ean_registers (EAN TEXT, RegisterID INTEGER)")
+    db.execute("DELETE FROM standin_ean_registers")
+    db.executemany("INSERT INTO standin_ean_registers VALUES (?, ?)", pairs)
+
+
+def _split_eans(csv: str) -> List[str]:
+    return list(dict.fromkeys(v.strip() for v in str(csv).split(",") if v.strip()))
+
+
+Rewrite = Tuple[str, tuple]
+
+
+def _min_max_for_ean(db: sqlite3.Connection, a: Dict[str, Any]) -> Rewrite:
+    regs = _registers(db, a["EAN_ConnectionPoint"], a.get("SearchMethod", "transferpoint"), _typeids(a["AllowedTypeIDs"]))
+    return (
+        f"SELECT MIN(utcperiod) AS MinUTCPeriod, MAX(utcperiod) AS MaxUTCPeriod FROM TBL_Data "
+        f"WHERE registerid IN ({_in_list(regs)}) AND utcperiod BETWEEN ? AND ?",
+        (_sp_datetime(a["StartDateStr"]), _sp_datetime(a["EndDateStr"])),
+    )
+
+
+def _min_max_for_eans(db: sqlite3.Connection, a: Dict[str, Any]) -> Rewrite:
+    typeids = _typeids(a["AllowedTypeIDs"])
+    method = a.get("SearchMethod", "transferpoint")
+    pairs: List[Tuple[str, Optional[int]]] = []
+    for ean in _split_eans(a["EANList"]):
+        regs = _registers(db, ean, method, typeids, strict=False)
+        pairs.extend((ean, r) for r in regs or [None])
+    _fill_ean_registers(db, pairs)
+    return (
+        """
+        SELECT rg.EAN, MIN(d.utcperiod) AS MinUTCPeriod, MAX(d.utcperiod) AS MaxUTCPeriod
+        FROM standin_ean_registers rg
+        LEFT JOIN TBL_Data d ON d.registerid = rg.RegisterID AND d.utcperiod BETWEEN ? AND ?
+        GROUP BY rg.EAN
+        """,
+        (_sp_datetime(a["StartDateStr"]), _sp_datetime(a["EndDateStr"])),
+    )
+
+
+def _connection_data(db: sqlite3.Connection, a: Dict[str, Any], *, long_format: bool) -> Rewrite:
+    ean, csv = a["EAN_ConnectionPoint"], a["AllowedTypeIDs"]
+    start, end = _sp_datetime(a["StartDateStr"]), _sp_datetime(a["EndDateStr"])
+    regs = _registers(db, ean, a.get("SearchMethod", "transferpoint"), _typeids(csv))
+    if not _has_data(db, regs, start, end):
+        raise ProcedureError(f"Geen data gevonden voor {ean} en TypeIDs={csv}")
+
+    include_status = bool(int(a.get("IncludeStatus", 0)))
+    source = (
+        f"SELECT {_bucket_sql(a.get('IntervalMinutes', 5))} AS bucket, registerid, consumption, statusid "
+        f"FROM TBL_Data WHERE registerid IN ({_in_list(regs)}) AND utcperiod BETWEEN ? AND ?"
+    )
+    if long_format:
+        status = "MAX(statusid)" if include_status else "NULL"
+        return (
+            f"""
+            SELECT bucket AS utcperiod, registerid, SUM(consumption) AS consumption, {status} AS statusid
+            FROM ({source}) GROUP BY bucket, registerid ORDER BY bucket, registerid
+            """,
+            (start, end),
+        )
+
+    # Wide: one consumption (and status) column per register that has data
+    present = db.execute(
+        f"""
+        SELECT r.ID, r.Description FROM TBL_Register r
+        WHERE r.ID IN ({_in_list(regs)})
+          AND EXISTS (SELECT 1 FROM TBL_Data d WHERE d.registerid = r.ID AND d.utcperiod BETWEEN ? AND ?)
+        ORDER BY r.ID
+        """,
+        (start, end),
+    ).fetchall()
+    cols = [
+        f'MAX(CASE WHEN registerid = {rid} THEN consumption END) AS "{desc} ({rid}) (consumption)"'
+        for rid, desc in present
+    ]
+    if include_status:
+        cols += [
+            f'MAX(CASE WHEN registerid = {rid} THEN statusid END) AS "{desc} ({rid}) (status)"' for rid, desc in present
+        ]
+    return (
+        f"""
+        SELECT bucket AS utcperiod, {", ".join(cols)}
+        FROM (
+            SELECT bucket, registerid, SUM(consumption) AS consumption, MAX(COALESCE(statusid, '')) AS statusid
+            FROM ({source}) GROUP BY bucket, registerid
+        )
+        GROUP BY bucket ORDER BY bucket
+        """,
+        (start, end),
+    )
+
+
+def _min_max_only_ldn_odn(db: sqlite3.Connection, a: Dict[str, Any]) -> Rewrite:
+    ean = a["EAN_ConnectionPoint"]
+    if not _ean_exists(db, ean):
+        raise ProcedureError(f"Geen ConnectionPoint gevonden voor EAN={ean}")
+    return (
+        f"SELECT MIN(utcperiod) AS MinPeriod, MAX(utcperiod) AS MaxPeriod FROM TBL_Data "
+        f"WHERE registerid IN ({_in_list(_ean_registers(db, ean, ONLY_LDN_ODN_TYPEIDS))}) "
+        "AND utcperiod BETWEEN ? AND ?",
+        (_sp_datetime(a["StartDate"]), _sp_datetime(a["EndDate"])),
+    )
+
+
+def _min_max_periods_only_ldn_odn(db: sqlite3.Connection, a: Dict[str, Any]) -> Rewrite:
+    pairs: List[Tuple[str, Optional[int]]] = []
+    for ean in _split_eans(a["EANList"]):
+        regs = _ean_registers(db, ean, ONLY_LDN_ODN_TYPEIDS)
+        pairs.extend((ean, r) for r in regs or [None])
+    _fill_ean_registers(db, pairs)
+    return (
+        """
+        SELECT rg.EAN, MIN(d.utcperiod) AS MinPeriod, MAX(d.utcperiod) AS MaxPeriod
+        FROM standin_ean_registers rg
+        LEFT JOIN TBL_Data d ON d.registerid = rg.RegisterID AND d.utcperiod BETWEEN ? AND ?
+        GROUP BY rg.EAN
+        """,
+        (_sp_datetime(a["StartDate"]), _sp_datetime(a["EndDate"])),
+    )
+
+
+def _connection_data_only_ldn_odn(db: sqlite3.Connection, a: Dict[str, Any]) -> Rewrite:
+    ean = a["EAN_ConnectionPoint"]
+    start, end = _sp_datetime(a["StartDate"]), _sp_datetime(a["EndDate"])
+    if not _ean_exists(db, ean):
+        raise ProcedureError("Specified EAN does not exist.")
+    regs = _ean_registers(db, ean, ONLY_LDN_ODN_TYPEIDS)
+    descs = [
+        r[0]
+        for r in db.execute(
+            f"""
+            SELECT DISTINCT r.Description FROM TBL_Register r
+            WHERE r.ID IN ({_in_list(regs)})
+              AND EXISTS (SELECT 1 FROM TBL_Data d WHERE d.registerid = r.ID AND d.utcperiod BETWEEN ? AND ?)
+            ORDER BY r.Description
+            """,
+            (start, end),
+        )
+    ]
+    if not descs:
+        raise ProcedureError("No data found for the specified parameters.")
+    cols = ", ".join(f'MAX(CASE WHEN r.Description = ? THEN d.consumption END) AS "{desc}"' for desc in descs)
+    return (
+        f"""
+        SELECT d.utcperiod, {cols}
+        FROM TBL_Data d JOIN TBL_Register r ON r.ID = d.registerid
+        WHERE d.registerid IN ({_in_list(regs)}) AND d.utcperiod BETWEEN ? AND ?
+        GROUP BY d.utcperiod ORDER BY d.utcperiod
+        """,
+        (*descs, start, end),
+    )
+
+
+PROCEDURES: Dict[str, Callable[[sqlite3.Connection, Dict[str, Any]], Rewrite]] = {
+    "usp_GetMinMaxPeriodForEAN": _min_max_for_ean,
+    "usp_GetMinMaxPeriodForEANs": _min_max_for_eans,
+    "usp_GetConnectionDataFull": lambda db, a: _connection_data(db, a, long_format=False),
+    "usp_GetConnectionDataLong": lambda db, a: _connection_data(db, a, long_format=True),
+    "usp_GetMinMaxPeriod_OnlyLDNODN": _min_max_only_ldn_odn,
+    "usp_GetMinMaxPeriods_OnlyLDNODN": _min_max_periods_only_ldn_odn,
+    "usp_GetConnectionDataFull_OnlyLDNODN": _connection_data_only_ldn_odn,
+}
+
+_EXEC_PATTERN = re.compile(r"^\s*EXEC\s+(?:\[?dbo\]?\.)?\[?(\w+)\]?(.*)$", re.IGNORECASE | re.DOTALL)
+_PARAM_PATTERN = re.compile(r"@(\w+)\s*=\s*\?")
+
+
+def _rewrite_exec(conn, cursor, statement, parameters, context, executemany):
+    match = _EXEC_PATTERN.match(statement)
+    if match is None:
+        return statement, parameters
+    name = match.group(1)
+    handler = PROCEDURES.get(name)
+    if handler is None:
+        # Same text and number as SQL Server, so the long-format fallback can be exercised
+        raise ProcedureError(f"Could not find stored procedure 'dbo.{name}'. (2812)")
+    args = dict(zip(_PARAM_PATTERN.findall(match.group(2)), parameters or ()))
+    return handler(cursor.connection, args)
+
+
+# --------------------------------------------------------------------------- #
+# Engine
+# --------------------------------------------------------------------------- #
+def standin_engine(path: str) -> Engine:
+    """SQLAlchemy engine on the stand-in file with `dbo` attached and EXEC emulation."""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def _attach_dbo(dbapi_conn, _record):
+        dbapi_conn.execute(f"ATTACH DATABASE '{path}' AS dbo")
+
+    event.listen(engine, "before_cursor_execute", _rewrite_exec, retval=True)
+    return engine
+
+
+def create_standin(spec: SyntheticSpec, *, data_dir: str = DEFAULT_DATA_DIR, rebuild: bool = False) -> Engine:
+    """Engine for `spec`, generating the database file on first use."""
+    path = database_path(spec, data_dir)
+    if rebuild or not os.path.exists(path):
+        build_database(spec, path)
+    return standin_engine(path)
+
+
+_installed: Optional[Engine] = None
+
+
+def _installed_engine(*, autocommit: bool = False) -> Engine:
+    return _installed
+
+
+def install(engine: Engine) -> None:
+    """
+    Make `db_connection.get_engine()` return `engine`. The first call must come
+    before importing db_utils / dataset_utils / register_catalog, which bind
+    `get_engine` at import time; later calls just switch the engine.
+    """
+    global _installed
+    import db_connection
+
+    _installed = engine
+    db_connection.get_engine = _installed_engine
+
+
+__all__ = [
+    "PROCEDURES",
+    "ProcedureError",
+    "build_database",
+    "create_standin",
+    "database_path",
+    "install",
+    "standin_engine",
+]
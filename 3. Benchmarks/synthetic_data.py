@@ -0,0 +1,130 @@
+"""
+synthetic_data.py
+-----------------
+Synthetic meter data with the shape of *TBL_ConnectionPoint* / *TBL_Register* /
+*TBL_Data*, for benchmarking without the production SQL Server.
+
+• Deterministic: the same `SyntheticSpec` (incl. seed) gives the same rows.
+• Data is produced per register, so the generator never holds the whole
+  `TBL_Data` in memory.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Iterator, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+# --------------------------------------------------------------------------- #
+# Configuration
+# --------------------------------------------------------------------------- #
+# (TypeId, description) per register slot of an EAN; the first two are the main
+# LDN/ODN meters used by 003, the rest cover other groups of mappings.py.
+REGISTER_TYPES: List[Tuple[int, str]] = [
+    (1000, "Hoofdmeting LDN"),
+    (1001, "Hoofdmeting ODN"),
+    (1003, "Controlemeting LDN"),
+    (1004, "Controlemeting ODN"),
+    (1006, "Bruto productie"),
+    (1032, "Gas verbruik"),
+    (1014, "Blindvermogen LDN"),
+    (1017, "Blindvermogen ODN"),
+]
+
+# Non-empty statuses, see dataset_utils.STATUS_LABELS
+STATUS_VALUES = np.array(["T", "P"], dtype=object)
+
+
+class SyntheticSpec(NamedTuple):
+    """Size and shape of a synthetic dataset."""
+
+    n_eans: int = 10
+    registers_per_ean: int = 4
+    interval_minutes: int = 15  # 5 or 15, as delivered by the meters
+    days: int = 31
+    status_density: float = 0.01  # fraction of rows with a "T"/"P" status
+    start: datetime = datetime(2024, 1, 1)
+    seed: int = 42
+
+    @property
+    def periods_per_register(self) -> int:
+        return self.days * 24 * 60 // self.interval_minutes
+
+    @property
+    def data_rows(self) -> int:
+        return self.n_eans * self.registers_per_ean * self.periods_per_register
+
+    @property
+    def end(self) -> datetime:
+        return self.start + timedelta(minutes=self.interval_minutes * (self.periods_per_register - 1))
+
+
+# --------------------------------------------------------------------------- #
+# Generators
+# --------------------------------------------------------------------------- #
+def ean_code(index: int) -> str:
+    """18-digit EAN for connection point `index` (stable across runs)."""
+    return f"871{index:015d}"
+
+
+def generate_connection_points(spec: SyntheticSpec) -> pd.DataFrame:
+    """One connection point per EAN; no transfer points, one object per EAN."""
+    ids = np.arange(1, spec.n_eans + 1)
+    return pd.DataFrame(
+        {
+            "ID": ids,
+            "EAN_ConnectionPoint": [ean_code(i) for i in ids],
+            "TransferPointID": [None] * spec.n_eans,
+            "ObjectId": ids + 10_000,
+        }
+    )
+
+
+def generate_registers(spec: SyntheticSpec) -> pd.DataFrame:
+    """`registers_per_ean` registers per connection point, cycling `REGISTER_TYPES`."""
+    rows = []
+    for cp in range(1, spec.n_eans + 1):
+        for slot in range(spec.registers_per_ean):
+            typeid, desc = REGISTER_TYPES[slot % len(REGISTER_TYPES)]
+            rid = cp * 100 + slot
+            rows.append((rid, typeid, f"{desc} {slot + 1}", cp, cp + 50_000))
+    return pd.DataFrame(rows, columns=["ID", "TypeId", "Description", "ConnectionPointId", "RegistratorID"])
+
+
+def iter_data(spec: SyntheticSpec) -> Iterator[pd.DataFrame]:
+    """
+    Yield the *TBL_Data* rows (`utcperiod`, `registerid`, `consumption`,
+    `statusid`) one register at a time.
+    """
+    rng = np.random.default_rng(spec.seed)
+    n = spec.periods_per_register
+    periods = pd.date_range(spec.start, periods=n, freq=f"{spec.interval_minutes}min")
+    # Daily profile so aggregates are not flat noise
+    hour = periods.hour.to_numpy() + periods.minute.to_numpy() / 60
+    profile = 1.0 + 0.6 * np.sin((hour - 6) / 24 * 2 * np.pi)
+
+    for rid in generate_registers(spec)["ID"]:
+        consumption = np.round(profile * rng.gamma(2.0, 2.5, n) * spec.interval_minutes / 15, 3)
+        status = np.full(n, "", dtype=object)
+        flagged = rng.random(n) < spec.status_density
+        status[flagged] = rng.choice(STATUS_VALUES, int(flagged.sum()))
+        yield pd.DataFrame(
+            {
+                "utcperiod": periods,
+                "registerid": int(rid),
+                "consumption": consumption,
+                "statusid": status,
+            }
+        )
+
+
+__all__ = [
+    "SyntheticSpec",
+    "REGISTER_TYPES",
+    "ean_code",
+    "generate_connection_points",
+    "generate_registers",
+    "iter_data",
+]
@@ -35,18 +35,17 @@ for nb in "${!NB_PORTS[@]}"; do
     || { echo "[ERROR] Missing notebook: $NOTEBOOK_DIR/$nb" >&2; exit 1; }
 done
 
-# ── Launch Voila servers ──────────────────────────────────────────────────────
-echo "[INFO] Launching Voila dashboards (using PATH from Dockerfile)…"
-for nb in "${!NB_PORTS[@]}"; do
-  port=${NB_PORTS[$nb]}
-  if ! nc -z 127.0.0.1 "$port" 2>/dev/null; then
-    echo "  → $NOTEBOOK_DIR/$nb → port $port"
-    nohup voila "$NOTEBOOK_DIR/$nb" --port="$port" --no-browser --ip=0.0.0.0 \
-      > "logs/${nb%.ipynb}.log" 2>&1 &
-  else
-    echo "  → port $port busy, skipping $nb"
-  fi
-done
+# ── Launch main UI; other notebooks start on demand ──────────────────────────
+# notebook_servers.py starts 000_Start_UI and a control endpoint; the buttons in
+# the UI start the other Voila servers, which stop again after
+# LAUNCHER_IDLE_MINUTES without use.
+echo "[INFO] Launching main UI; other dashboards start on demand…"
+if ! nc -z 127.0.0.1 "$UI_PORT" 2>/dev/null; then
+  python "$NOTEBOOK_DIR/notebook_servers.py" --ip=0.0.0.0 --log-dir="$SCRIPT_DIR/logs" \
+    >> logs/launcher.log 2>&1 &
+else
+  echo "  → port $UI_PORT busy, skipping launcher"
+fi
 
 # ── Wait for UI ────────────────────────────────────────────────────────────────
 echo "[INFO] Waiting for UI at http://localhost:$UI_PORT …"